@@ -0,0 +1,71 @@
+import json
+import functools
+import logging
+import databutton as db
+
+logger = logging.getLogger(__name__)
+
+# Import Firebase Admin modules
+try:
+    import firebase_admin
+    from firebase_admin import credentials, firestore, firestore_async
+    HAS_FIREBASE_ADMIN = True
+except ImportError:
+    logger.warning("Firebase Admin SDK not available, please install it with pip")
+    HAS_FIREBASE_ADMIN = False
+
+# Shared, lazy Firebase Admin bootstrap. The API modules used to each run
+# their own import-time init block, parsing the service-account JSON and
+# building credentials several times during startup; everything now funnels
+# through these memoized accessors and nothing happens until first use.
+
+@functools.lru_cache(maxsize=1)
+def get_firebase_app():
+    """Initialize Firebase Admin once and return the app, or None on failure"""
+    if not HAS_FIREBASE_ADMIN:
+        return None
+
+    # Check if Firebase Admin SDK is already initialized
+    try:
+        return firebase_admin.get_app()
+    except ValueError:
+        pass
+
+    # Not initialized, try to initialize from secrets
+    try:
+        firebase_credentials_json = db.secrets.get("FIREBASE_SERVICE_ACCOUNT")
+        if not firebase_credentials_json or not firebase_credentials_json.strip():
+            logger.warning("Firebase service account not found or empty in secrets")
+            return None
+
+        # Parse JSON string into dictionary and build credentials
+        cred_dict = json.loads(firebase_credentials_json)
+        cred = credentials.Certificate(cred_dict)
+        app = firebase_admin.initialize_app(cred)
+        logger.info("Firebase Admin SDK initialized successfully")
+        return app
+    except Exception as e:
+        logger.exception("Error initializing Firebase Admin SDK: %s", e)
+        return None
+
+@functools.lru_cache(maxsize=1)
+def get_firestore_client():
+    """Get the shared sync Firestore client, or None if unavailable"""
+    if get_firebase_app() is None:
+        return None
+    try:
+        return firestore.client()
+    except Exception as e:
+        logger.exception("Error getting Firestore client: %s", e)
+        return None
+
+@functools.lru_cache(maxsize=1)
+def get_async_firestore_client():
+    """Get the shared async Firestore client, or None if unavailable"""
+    if get_firebase_app() is None:
+        return None
+    try:
+        return firestore_async.client()
+    except Exception as e:
+        logger.exception("Error getting async Firestore client: %s", e)
+        return None
@@ -1,7 +1,11 @@
 from fastapi import APIRouter, HTTPException
-import aiohttp
+import asyncio
 import databutton as db
-import json
+import logging
+import orjson
+from app.apis.apify_integration import get_session, _get_with_retry
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/apify-diagnostic")
 
@@ -12,65 +16,84 @@ APIFY_API_TOKEN = db.secrets.get("APIFY_API_TOKEN")
 async def run_apify_diagnostic():
     """Test endpoint to diagnose Apify API connection issues"""
     try:
-        async with aiohttp.ClientSession() as session:
-            # First, check if the token is valid by getting user info
-            user_url = f"https://api.apify.com/v2/users/me?token={APIFY_API_TOKEN}"
-            print(f"Checking user info at: {user_url.replace(APIFY_API_TOKEN, '***')}")
-            
-            async with session.get(user_url) as response:
-                status = response.status
-                response_text = await response.text()
-                print(f"User info status: {status}")
-                print(f"User info response: {response_text}")
-                
-                if status != 200:
-                    return {
-                        "success": False,
-                        "error": f"Failed to validate Apify token: HTTP {status}",
-                        "response": response_text
-                    }
-                
-                user_data = await response.json()
-            
-            # Next, list available actors
-            actors_url = f"https://api.apify.com/v2/acts?token={APIFY_API_TOKEN}"
-            print(f"Checking available actors at: {actors_url.replace(APIFY_API_TOKEN, '***')}")
-            
-            async with session.get(actors_url) as response:
-                status = response.status
-                response_text = await response.text()
-                print(f"Actors list status: {status}")
-                print(f"Actors list response: {response_text}")
-                
-                if status != 200:
-                    return {
-                        "success": False,
-                        "error": f"Failed to list actors: HTTP {status}",
-                        "response": response_text
-                    }
-                
-                actors_data = await response.json()
-            
-            # Finally, check a public Instagram scraper actor to see if it exists and is accessible
-            insta_actor_url = f"https://api.apify.com/v2/acts/zuzka~instagram-profile-scraper?token={APIFY_API_TOKEN}"
-            print(f"Checking Instagram scraper actor at: {insta_actor_url.replace(APIFY_API_TOKEN, '***')}")
-            
-            async with session.get(insta_actor_url) as response:
-                status = response.status
-                response_text = await response.text()
-                print(f"Instagram actor status: {status}")
-                print(f"Instagram actor response: {response_text}")
-                
-                insta_actor_accessible = status == 200
-            
-            return {
-                "success": True,
-                "user": user_data,
-                "actors_count": len(actors_data.get("data", {}).get("items", [])),
-                "instagram_actor_accessible": insta_actor_accessible,
-                "apify_token_valid": True,
-            }
-                
+        # Reuse the shared keep-alive session for all three checks
+        session = await get_session()
+
+        # The three checks are independent idempotent GETs, so run them
+        # concurrently instead of paying three sequential round-trips
+        user_url = "https://api.apify.com/v2/users/me"
+        actors_url = "https://api.apify.com/v2/acts"
+        insta_actor_url = "https://api.apify.com/v2/acts/zuzka~instagram-profile-scraper"
+        logger.debug("Checking user info, actors list, and Instagram actor concurrently")
+
+        user_resp, actors_resp, insta_resp = await asyncio.gather(
+            _get_with_retry(session, user_url),
+            _get_with_retry(session, actors_url),
+            _get_with_retry(session, insta_actor_url),
+            return_exceptions=True
+        )
+
+        # Release whatever did succeed if any of the checks blew up outright
+        responses = [user_resp, actors_resp, insta_resp]
+        failures = [r for r in responses if isinstance(r, Exception)]
+        if failures:
+            for r in responses:
+                if not isinstance(r, Exception):
+                    r.release()
+            raise failures[0]
+
+        # First, check if the token is valid by getting user info
+        async with user_resp as response:
+            status = response.status
+            response_text = await response.text()
+            logger.debug("User info status: %s", status)
+            logger.debug("User info response: %s", response_text)
+
+            if status != 200:
+                actors_resp.release()
+                insta_resp.release()
+                return {
+                    "success": False,
+                    "error": f"Failed to validate Apify token: HTTP {status}",
+                    "response": response_text
+                }
+
+            user_data = await response.json(content_type=None, loads=orjson.loads)
+
+        # Next, list available actors
+        async with actors_resp as response:
+            status = response.status
+            response_text = await response.text()
+            logger.debug("Actors list status: %s", status)
+            logger.debug("Actors list response: %s", response_text)
+
+            if status != 200:
+                insta_resp.release()
+                return {
+                    "success": False,
+                    "error": f"Failed to list actors: HTTP {status}",
+                    "response": response_text
+                }
+
+            actors_data = await response.json(content_type=None, loads=orjson.loads)
+
+        # Finally, check a public Instagram scraper actor to see if it exists and is accessible
+        async with insta_resp as response:
+            status = response.status
+            response_text = await response.text()
+            logger.debug("Instagram actor status: %s", status)
+            logger.debug("Instagram actor response: %s", response_text)
+
+            insta_actor_accessible = status == 200
+
+        return {
+            "success": True,
+            "user": user_data,
+            "actors_count": len(actors_data.get("data", {}).get("items", [])),
+            "instagram_actor_accessible": insta_actor_accessible,
+            "apify_token_valid": True,
+        }
+
     except Exception as e:
-        print(f"Error checking Apify connection: {str(e)}")
+        logger.exception("Error checking Apify connection: %s", e)
         raise HTTPException(status_code=500, detail=f"Error checking Apify connection: {str(e)}")
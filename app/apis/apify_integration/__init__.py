@@ -1,19 +1,118 @@
 import aiohttp
-import json
+import os
+import orjson
+import ssl
 import asyncio
+import random
 import time
 import re
 from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import Optional
+from cachetools import TTLCache
 from pydantic import BaseModel
 from fastapi import APIRouter
+import logging
 import databutton as db
 from app.apis.models import SocialPlatform, SocialMediaProfile
 
 # Get Apify API token from secrets
 APIFY_API_TOKEN = db.secrets.get("APIFY_API_TOKEN")
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter(prefix="/apify")
 
+# Shared aiohttp session so all Apify calls reuse keep-alive connections
+# instead of paying a new TCP + TLS handshake per request
+_session: Optional[aiohttp.ClientSession] = None
+
+# One SSLContext for the whole process - building it per connection would
+# redo certificate-store loading every time
+_ssl_ctx = ssl.create_default_context()
+
+async def get_session() -> aiohttp.ClientSession:
+    """Return the shared ClientSession, creating it on first use"""
+    global _session
+    if _session is None or _session.closed:
+        _session = aiohttp.ClientSession(
+            # All traffic goes to api.apify.com, so tune the connector for
+            # aggressive reuse of a single host's keep-alive pool
+            connector=aiohttp.TCPConnector(
+                limit=64,
+                limit_per_host=32,
+                ttl_dns_cache=600,
+                use_dns_cache=True,
+                keepalive_timeout=75,
+                enable_cleanup_closed=True,
+                ssl=_ssl_ctx
+            ),
+            timeout=aiohttp.ClientTimeout(total=60, connect=5),
+            # Token travels in a header, keeping URLs canonical and log-safe
+            headers={"Authorization": f"Bearer {APIFY_API_TOKEN}"}
+        )
+    return _session
+
+@router.on_event("shutdown")
+async def close_session():
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+        _session = None
+
+# Explicit per-request timeouts so a hung Apify socket can't stall a worker
+DEFAULT_TIMEOUT = aiohttp.ClientTimeout(total=30, connect=5, sock_read=15)
+POLL_TIMEOUT = aiohttp.ClientTimeout(total=10, connect=3)
+# Long deadline for the synchronous run endpoint, which blocks server-side
+RUN_SYNC_TIMEOUT = aiohttp.ClientTimeout(total=150, connect=5)
+
+_RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+async def _get_with_retry(session, url, *, attempts=3, timeout=DEFAULT_TIMEOUT):
+    """GET with bounded retries on transient failures (idempotent calls only)"""
+    last_error = None
+    for attempt in range(1, attempts + 1):
+        try:
+            response = await session.get(url, timeout=timeout)
+            if response.status not in _RETRY_STATUSES or attempt == attempts:
+                return response
+            logger.debug("Retryable status %s from GET, attempt %s/%s", response.status, attempt, attempts)
+            response.release()
+        except (asyncio.TimeoutError, aiohttp.ClientConnectorError) as e:
+            last_error = e
+            logger.warning("Transient error on GET attempt %s/%s: %s", attempt, attempts, e)
+            if attempt == attempts:
+                raise
+        # Capped exponential backoff with full jitter between attempts
+        await asyncio.sleep(random.uniform(0, min(10.0, 2 ** (attempt - 1))))
+    raise last_error if last_error else Exception(f"GET failed after {attempts} attempts: {url}")
+
+async def _preview(response, n=200):
+    """Read at most n bytes of a response body for log/error previews,
+    without decoding the whole payload"""
+    chunk = await response.content.read(n)
+    return chunk.decode('utf-8', 'replace')
+
+# Typed errors so callers can tell retryable failures from fatal ones
+# instead of substring-matching English error text
+class ApifyError(Exception):
+    pass
+
+class ApifyAuthError(ApifyError):
+    pass
+
+class ApifyQuotaError(ApifyError):
+    pass
+
+class ApifyRateLimitError(ApifyError):
+    pass
+
+class ApifyTimeoutError(ApifyError):
+    pass
+
+class ApifyNoDataError(ApifyError):
+    pass
+
 class ScrapeUrlRequest(BaseModel):
     url: str
 
@@ -28,11 +127,17 @@ class ApifyConnectionResponse(BaseModel):
     api_token_configured: bool = None
     test_actor_available: bool = None
 
+# Remember a successful token validation for a while so repeated
+# connection checks don't each cost an outbound request to Apify
+_CONNECTION_CHECK_TTL = 300  # seconds
+_last_connection_ok: Optional[ApifyConnectionResponse] = None
+_last_connection_ok_at: float = 0.0
+
 @router.get("/check-connection", response_model=ApifyConnectionResponse)
-async def check_apify_connection():
+async def check_apify_connection(force: bool = False):
     """Check if Apify API is available and perform a basic test scrape"""
-    global APIFY_API_TOKEN
-    
+    global APIFY_API_TOKEN, _last_connection_ok, _last_connection_ok_at
+
     # If API token is not available, it's not configured
     if not APIFY_API_TOKEN:
         return ApifyConnectionResponse(
@@ -40,40 +145,38 @@ async def check_apify_connection():
             message="Apify API token not configured. Please add APIFY_API_TOKEN to secrets.",
             api_token_configured=False
         )
+
+    # Reuse a recent successful validation unless the caller forces a re-check
+    if not force and _last_connection_ok is not None \
+            and time.monotonic() - _last_connection_ok_at < _CONNECTION_CHECK_TTL:
+        return _last_connection_ok
+
     try:
-        # Make a simple request to the Apify API
-        async with aiohttp.ClientSession() as session:
-            # Try multiple possible endpoint formats to ensure compatibility
-            test_urls = [
-                # Primary user endpoint
-                f"https://api.apify.com/v2/user/me?token={APIFY_API_TOKEN}"
-            ]
-            
-            for test_url in test_urls:
-                print(f"Testing Apify URL: {test_url.replace(APIFY_API_TOKEN, '***')}")
-                try:
-                    async with session.get(test_url, timeout=10) as response:
-                        print(f"Apify test connection status: {response.status}")
-                        response_text = await response.text()
-                        print(f"Response preview: {response_text[:100]}...")
-                        
-                        if response.status == 200:
-                            return ApifyConnectionResponse(
-                                connected=True,
-                                message=f"Successfully connected to Apify API using endpoint: {test_url.replace(APIFY_API_TOKEN, '***')}",
-                                api_token_configured=True,
-                                test_actor_available=True
-                            )
-                except Exception as e:
-                    print(f"Error with endpoint {test_url.replace(APIFY_API_TOKEN, '***')}: {str(e)}")
-                    continue
-            
-            # If we get here, none of the endpoints worked
-            return ApifyConnectionResponse(
-                connected=False,
-                message="Could not connect to any Apify API endpoint. Please check your API token and try again.",
-                api_token_configured=False
-            )
+        # Make a simple request to the Apify API over the shared session
+        session = await get_session()
+        test_url = "https://api.apify.com/v2/user/me"
+        logger.debug("Testing Apify URL: %s", test_url)
+
+        async with await _get_with_retry(session, test_url) as response:
+            logger.debug("Apify test connection status: %s", response.status)
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Response preview: %s...", await _preview(response, 100))
+
+            if response.status == 200:
+                _last_connection_ok = ApifyConnectionResponse(
+                    connected=True,
+                    message=f"Successfully connected to Apify API using endpoint: {test_url}",
+                    api_token_configured=True,
+                    test_actor_available=True
+                )
+                _last_connection_ok_at = time.monotonic()
+                return _last_connection_ok
+
+        return ApifyConnectionResponse(
+            connected=False,
+            message="Could not connect to any Apify API endpoint. Please check your API token and try again.",
+            api_token_configured=False
+        )
     except Exception as e:
         return ApifyConnectionResponse(
             connected=False,
@@ -81,12 +184,57 @@ async def check_apify_connection():
             api_token_configured=True
         )
 
+# Precompiled patterns - compiling once at import avoids re-running the
+# regex cache lookup (or six substring scans) on every request
+_COUNT_RE = re.compile(r'\d+\.?\d*')
+
+_DETECT_RE = re.compile(
+    r'(instagram\.com|twitter\.com|x\.com|facebook\.com|fb\.com|'
+    r'tiktok\.com|youtube\.com|youtu\.be|linkedin\.com)'
+)
+
+_DETECT_PLATFORMS = {
+    'instagram.com': SocialPlatform.INSTAGRAM,
+    'twitter.com': SocialPlatform.TWITTER,
+    'x.com': SocialPlatform.TWITTER,
+    'facebook.com': SocialPlatform.FACEBOOK,
+    'fb.com': SocialPlatform.FACEBOOK,
+    'tiktok.com': SocialPlatform.TIKTOK,
+    'youtube.com': SocialPlatform.YOUTUBE,
+    'youtu.be': SocialPlatform.YOUTUBE,
+    'linkedin.com': SocialPlatform.LINKEDIN,
+}
+
+# Username extraction patterns per platform, tried in order
+_USERNAME_PATTERNS = {
+    SocialPlatform.INSTAGRAM: [re.compile(r'instagram\.com/([^/?]+)')],
+    SocialPlatform.TWITTER: [re.compile(r'(?:twitter\.com|x\.com)/([^/?]+)')],
+    SocialPlatform.FACEBOOK: [re.compile(r'facebook\.com/([^/?]+)')],
+    SocialPlatform.TIKTOK: [re.compile(r'tiktok\.com/@([^/?]+)')],
+    # YouTube has two formats: /user/username or /c/channelname or /@username
+    SocialPlatform.YOUTUBE: [
+        re.compile(r'youtube\.com/(?:user|c|@)/([^/?]+)'),
+        re.compile(r'youtube\.com/([^/?]+)')
+    ],
+    SocialPlatform.LINKEDIN: [re.compile(r'linkedin\.com/in/([^/?]+)')],
+}
+
 # Helper to extract numbers from strings like "1.5M" or "10K"
 def parse_count(text):
-    if not text:
+    if text is None:
         return None
 
+    # Fast path: Apify usually returns counts as plain numbers already
+    if isinstance(text, bool):
+        return int(text)
+    if isinstance(text, int):
+        return text
+    if isinstance(text, float):
+        return int(text)
+
     text = str(text).strip().lower()
+    if not text:
+        return None
 
     # Remove commas
     text = text.replace(',', '')
@@ -99,323 +247,363 @@ def parse_count(text):
     if 'b' in text:
         return int(float(text.replace('b', '')) * 1000000000)
 
+    # Plain digit strings don't need the regex fallback
+    if text.isdigit():
+        return int(text)
+
     # Try to extract any numbers
-    numbers = re.findall(r'\d+\.?\d*', text)
+    numbers = _COUNT_RE.findall(text)
     if numbers:
         return int(float(numbers[0]))
 
     return None
 
 # Detect platform from URL
+@lru_cache(maxsize=4096)
 def detect_platform_from_url(url):
-    url = url.lower()
-
-    if 'instagram.com' in url:
-        return SocialPlatform.INSTAGRAM
-    elif 'twitter.com' in url or 'x.com' in url:
-        return SocialPlatform.TWITTER
-    elif 'facebook.com' in url or 'fb.com' in url:
-        return SocialPlatform.FACEBOOK
-    elif 'tiktok.com' in url:
-        return SocialPlatform.TIKTOK
-    elif 'youtube.com' in url or 'youtu.be' in url:
-        return SocialPlatform.YOUTUBE
-    elif 'linkedin.com' in url:
-        return SocialPlatform.LINKEDIN
-
-    return None
+    match = _DETECT_RE.search(url.lower())
+    return _DETECT_PLATFORMS[match.group(1)] if match else None
 
 # Extract username from URL
+@lru_cache(maxsize=4096)
 def extract_username_from_url(url, platform):
-    if platform == SocialPlatform.INSTAGRAM:
-        match = re.search(r'instagram\.com/([^/?]+)', url)
-        return match.group(1) if match else None
-
-    elif platform in [SocialPlatform.TWITTER]:
-        match = re.search(r'(?:twitter\.com|x\.com)/([^/?]+)', url)
-        return match.group(1) if match else None
-
-    elif platform == SocialPlatform.FACEBOOK:
-        match = re.search(r'facebook\.com/([^/?]+)', url)
-        return match.group(1) if match else None
-
-    elif platform == SocialPlatform.TIKTOK:
-        match = re.search(r'tiktok\.com/@([^/?]+)', url)
-        return match.group(1) if match else None
-
-    elif platform == SocialPlatform.YOUTUBE:
-        # YouTube has two formats: /user/username or /c/channelname or /@username
-        match = re.search(r'youtube\.com/(?:user|c|@)/([^/?]+)', url) or re.search(r'youtube\.com/([^/?]+)', url)
-        return match.group(1) if match else None
-
-    elif platform == SocialPlatform.LINKEDIN:
-        match = re.search(r'linkedin\.com/in/([^/?]+)', url)
-        return match.group(1) if match else None
+    for pattern in _USERNAME_PATTERNS.get(platform, []):
+        match = pattern.search(url)
+        if match:
+            return match.group(1)
 
     return None
 
-# Process raw data from Apify based on platform
-def process_apify_data(raw_data, platform):
-    result = {
+# Per-platform mapping from our profile fields to Apify's raw field names
+_FIELD_MAP = {
+    SocialPlatform.INSTAGRAM: {
+        "username": "username",
+        "profile_url": "url",
+        "followers": "followersCount",
+        "following": "followsCount",
+        "posts": "postsCount",
+        "display_name": "fullName",
+        "bio": "biography",
+        "profile_image": "profilePicUrl",
+    },
+    SocialPlatform.TWITTER: {
+        "username": "username",
+        "profile_url": "url",
+        "followers": "followersCount",
+        "following": "friendsCount",
+        "posts": "statusesCount",
+        "display_name": "displayName",
+        "bio": "description",
+        "profile_image": "profileImageUrl",
+    },
+    SocialPlatform.FACEBOOK: {
+        "username": "username",
+        "profile_url": "url",
+        "followers": "followers",
+        "display_name": "name",
+        "bio": "about",
+        "profile_image": "profilePic",
+    },
+    SocialPlatform.TIKTOK: {
+        "username": "username",
+        "profile_url": "url",
+        "followers": "followerCount",
+        "following": "followingCount",
+        "posts": "videoCount",
+        "display_name": "nickname",
+        "bio": "signature",
+        "profile_image": "avatarMedium",
+    },
+    SocialPlatform.YOUTUBE: {
+        "username": "title",
+        "profile_url": "url",
+        "followers": "subscriberCount",
+        "posts": "videoCount",
+        "display_name": "title",
+        "bio": "description",
+        "profile_image": "thumbnailUrl",
+    },
+}
+
+# Fields that go through parse_count rather than being copied as strings
+_COUNT_FIELDS = {"followers", "following", "posts"}
+
+# Apify actor per platform
+_ACTOR_IDS = {
+    SocialPlatform.INSTAGRAM: "dSCLg0C3YEZ83HzYX",  # Instagram Profile Scraper
+    SocialPlatform.TWITTER: "shu8hvrXbJbY3Eb9W",  # Twitter Scraper
+    SocialPlatform.FACEBOOK: "C43dQxtEJcExnmQDb",  # Facebook Scraper
+    SocialPlatform.TIKTOK: "Ht6vuYYeQxhP3s5oJ",  # TikTok Scraper
+    SocialPlatform.YOUTUBE: "5VxZm3AYupnHMH4EK",  # YouTube Scraper
+    SocialPlatform.LINKEDIN: "fAJCzM35OgNu2C76W",  # LinkedIn Scraper
+}
+
+# Actor run input per platform, built from the extracted username and URL
+_INPUT_BUILDERS = {
+    SocialPlatform.INSTAGRAM: lambda username, url: {
+        "usernames": [username] if username else [url],
+        "resultsLimit": 1,
+        "proxy": {"useApifyProxy": True}
+    },
+    SocialPlatform.TWITTER: lambda username, url: {
+        "handles": [username] if username else [url],
+        "maxItems": 1,
+        "proxy": {"useApifyProxy": True}
+    },
+    SocialPlatform.TIKTOK: lambda username, url: {
+        "usernames": [username] if username else [url],
+        "maxResults": 1,
+        "proxy": {"useApifyProxy": True}
+    },
+    SocialPlatform.YOUTUBE: lambda username, url: {
+        "startUrls": [{"url": url}],
+        "maxResults": 1,
+        "proxy": {"useApifyProxy": True}
+    },
+    SocialPlatform.FACEBOOK: lambda username, url: {
+        "startUrls": [{"url": url}],
+        "maxPagesPerQuery": 1,
+        "proxy": {"useApifyProxy": True}
+    },
+    SocialPlatform.LINKEDIN: lambda username, url: {
+        "startUrls": [{"url": url}],
+        "proxy": {"useApifyProxy": True}
+    },
+}
+
+# Process raw data from Apify based on platform. Batch callers can pass a
+# shared now_iso so each item doesn't pay its own datetime.now() call.
+def process_apify_data(raw_data, platform, now_iso=None):
+    return {
         "platform": platform.value,
         "username": "",
         "profile_url": "",
         "followers": 0,
         "following": 0,
         "posts": 0,
-        "scrape_date": datetime.now().isoformat(),
+        "scrape_date": now_iso or datetime.now().isoformat(),
         "daily_stats": None,
-        "content_performance": None
+        "content_performance": None,
+        **{
+            dst: parse_count(raw_data.get(src, 0)) if dst in _COUNT_FIELDS
+            else raw_data.get(src, "")
+            for dst, src in _FIELD_MAP.get(platform, {}).items()
+        },
     }
 
-    # Process based on platform
-    if platform == SocialPlatform.INSTAGRAM:
-        result["username"] = raw_data.get("username", "")
-        result["profile_url"] = raw_data.get("url", "")
-        result["followers"] = parse_count(raw_data.get("followersCount", 0))
-        result["following"] = parse_count(raw_data.get("followsCount", 0))
-        result["posts"] = parse_count(raw_data.get("postsCount", 0))
-        result["display_name"] = raw_data.get("fullName", "")
-        result["bio"] = raw_data.get("biography", "")
-        result["profile_image"] = raw_data.get("profilePicUrl", "")
-
-    elif platform == SocialPlatform.TWITTER:
-        result["username"] = raw_data.get("username", "")
-        result["profile_url"] = raw_data.get("url", "")
-        result["followers"] = parse_count(raw_data.get("followersCount", 0))
-        result["following"] = parse_count(raw_data.get("friendsCount", 0))
-        result["posts"] = parse_count(raw_data.get("statusesCount", 0))
-        result["display_name"] = raw_data.get("displayName", "")
-        result["bio"] = raw_data.get("description", "")
-        result["profile_image"] = raw_data.get("profileImageUrl", "")
-
-    elif platform == SocialPlatform.FACEBOOK:
-        result["username"] = raw_data.get("username", "")
-        result["profile_url"] = raw_data.get("url", "")
-        result["followers"] = parse_count(raw_data.get("followers", 0))
-        result["display_name"] = raw_data.get("name", "")
-        result["bio"] = raw_data.get("about", "")
-        result["profile_image"] = raw_data.get("profilePic", "")
-
-    elif platform == SocialPlatform.TIKTOK:
-        result["username"] = raw_data.get("username", "")
-        result["profile_url"] = raw_data.get("url", "")
-        result["followers"] = parse_count(raw_data.get("followerCount", 0))
-        result["following"] = parse_count(raw_data.get("followingCount", 0))
-        result["posts"] = parse_count(raw_data.get("videoCount", 0))
-        result["display_name"] = raw_data.get("nickname", "")
-        result["bio"] = raw_data.get("signature", "")
-        result["profile_image"] = raw_data.get("avatarMedium", "")
-
-    elif platform == SocialPlatform.YOUTUBE:
-        result["username"] = raw_data.get("title", "")
-        result["profile_url"] = raw_data.get("url", "")
-        result["followers"] = parse_count(raw_data.get("subscriberCount", 0))
-        result["posts"] = parse_count(raw_data.get("videoCount", 0))
-        result["display_name"] = raw_data.get("title", "")
-        result["bio"] = raw_data.get("description", "")
-        result["profile_image"] = raw_data.get("thumbnailUrl", "")
-
-    return result
-
-# Helper function to handle Apify response
-async def process_json_response(response_text, platform):
+# Helper function to handle a parsed Apify response body
+def process_response_data(data, platform):
+    logger.debug("Successfully parsed JSON response of type: %s", type(data).__name__)
+
+    # Handle empty data
+    if data is None:
+        raise ApifyNoDataError("Apify returned null response")
+
+    # Extract items based on response structure
+    items = []
+
+    if isinstance(data, list):
+        items = data
+    elif isinstance(data, dict):
+        if 'data' in data:
+            if isinstance(data['data'], dict):
+                items = [data['data']]
+            elif isinstance(data['data'], list):
+                items = data['data']
+        elif 'items' in data and isinstance(data['items'], list):
+            items = data['items']
+        else:
+            items = [data]
+
+    # Make sure we have valid data
+    if not items or len(items) == 0:
+        raise ApifyNoDataError("No data items found in Apify response")
+
+    # Get the first item
+    raw_data = items[0]
+    logger.debug("Using first of %d data item(s)", len(items))
+
+    # Process the raw data into our standard format
+    return process_apify_data(raw_data, platform)
+
+# Parse an aiohttp response body straight into the profile dict, without
+# materializing the payload as an intermediate str
+async def process_json_response(response, platform):
     try:
-        data = json.loads(response_text)
-        print(f"Successfully parsed JSON response of type: {type(data).__name__}")
-        
-        # Handle empty data
-        if data is None:
-            raise Exception("Apify returned null response")
-            
-        # Extract items based on response structure
-        items = []
-        
-        if isinstance(data, list):
-            items = data
-        elif isinstance(data, dict):
-            if 'data' in data:
-                if isinstance(data['data'], dict):
-                    items = [data['data']]
-                elif isinstance(data['data'], list):
-                    items = data['data']
-            elif 'items' in data and isinstance(data['items'], list):
-                items = data['items']
-            else:
-                items = [data]
-        
-        # Make sure we have valid data
-        if not items or len(items) == 0:
-            raise Exception("No data items found in Apify response")
-        
-        # Get the first item
-        raw_data = items[0]
-        print(f"Using first data item of size: {len(str(raw_data))} bytes")
-        
-        # Process the raw data into our standard format
-        return process_apify_data(raw_data, platform)
-    except json.JSONDecodeError as e:
-        print(f"Invalid JSON response from Apify: {str(e)}")
-        raise Exception(f"Invalid JSON response from Apify: {str(e)}")
-        
+        data = await response.json(content_type=None, loads=orjson.loads)
+    except orjson.JSONDecodeError as e:
+        logger.warning("Invalid JSON response from Apify: %s", e)
+        raise ApifyError(f"Invalid JSON response from Apify: {str(e)}")
+
+    return process_response_data(data, platform)
+
 # Scrape profile with Apify - simplified and more robust
 async def scrape_profile_with_apify(url, platform):
-    print(f"Scraping {platform.value} profile from {url}")
+    logger.debug("Scraping %s profile from %s", platform.value, url)
 
     if not APIFY_API_TOKEN:
-        raise Exception("Apify API token is not configured. Please add an API token in settings.")
+        raise ApifyAuthError("Apify API token is not configured. Please add an API token in settings.")
 
     # Select appropriate Apify actor for platform
-    actor_id = None
-    if platform == SocialPlatform.INSTAGRAM:
-        actor_id = "dSCLg0C3YEZ83HzYX"  # Instagram Profile Scraper
-    elif platform == SocialPlatform.TWITTER:
-        actor_id = "shu8hvrXbJbY3Eb9W"  # Twitter Scraper
-    elif platform == SocialPlatform.FACEBOOK:
-        actor_id = "C43dQxtEJcExnmQDb"  # Facebook Scraper
-    elif platform == SocialPlatform.TIKTOK:
-        actor_id = "Ht6vuYYeQxhP3s5oJ"  # TikTok Scraper
-    elif platform == SocialPlatform.YOUTUBE:
-        actor_id = "5VxZm3AYupnHMH4EK"  # YouTube Scraper
-    elif platform == SocialPlatform.LINKEDIN:
-        actor_id = "fAJCzM35OgNu2C76W"  # LinkedIn Scraper
-
+    actor_id = _ACTOR_IDS.get(platform)
     if not actor_id:
-        raise Exception(f"No Apify actor available for platform {platform.value}")
+        raise ApifyError(f"No Apify actor available for platform {platform.value}")
+
+    # Run the actor synchronously - Apify blocks server-side and returns the
+    # dataset items in a single round-trip, so no client-side polling is needed
+    apify_url = f"https://api.apify.com/v2/acts/{actor_id}/run-sync-get-dataset-items?timeout=120"
+    logger.debug("Using Apify API URL: %s", apify_url)
 
-    # Prepare URL for actor run - use direct actor ID
-    apify_url = f"https://api.apify.com/v2/acts/{actor_id}/runs?token={APIFY_API_TOKEN}"
-    print(f"Using Apify API URL: {apify_url.replace(APIFY_API_TOKEN, '***')}")
-    
     # Prepare run input based on platform - no build parameter needed for direct actor calls
-    run_input = {}
     username = extract_username_from_url(url, platform)
-    
-    # Now set the platform-specific parameters
-    if platform == SocialPlatform.INSTAGRAM:
-        run_input.update({
-            "usernames": [username] if username else [url],
-            "resultsLimit": 1,
-            "proxy": {"useApifyProxy": True}
-        })
-    elif platform == SocialPlatform.TWITTER:
-        run_input.update({
-            "handles": [username] if username else [url],
-            "maxItems": 1,
-            "proxy": {"useApifyProxy": True}
-        })
-    elif platform == SocialPlatform.TIKTOK:
-        run_input.update({
-            "usernames": [username] if username else [url],
-            "maxResults": 1,
-            "proxy": {"useApifyProxy": True}
-        })
-    elif platform == SocialPlatform.YOUTUBE:
-        run_input.update({
-            "startUrls": [{"url": url}],
-            "maxResults": 1,
-            "proxy": {"useApifyProxy": True}
-        })
-    elif platform == SocialPlatform.FACEBOOK:
-        run_input.update({
-            "startUrls": [{"url": url}],
-            "maxPagesPerQuery": 1,
-            "proxy": {"useApifyProxy": True}
-        })
-    elif platform == SocialPlatform.LINKEDIN:
-        run_input.update({
-            "startUrls": [{"url": url}],
-            "proxy": {"useApifyProxy": True}
-        })
-
-    print(f"Starting Apify actor {actor_id} with input: {run_input}")
+    run_input = _INPUT_BUILDERS[platform](username, url)
+
+    logger.debug("Starting Apify actor %s with input: %s", actor_id, run_input)
 
     try:
-        async with aiohttp.ClientSession() as session:
-            headers = {"Content-Type": "application/json"}
-            
-            # Start the actor run
-            async with session.post(apify_url, json=run_input, headers=headers) as response:
-                print(f"Apify start run response status: {response.status}")
-                response_text = await response.text()
-                print(f"Response preview: {response_text[:100]}...")
-                
-                if response.status not in [200, 201]:
-                    # First URL format failed, try another format
-                    # Try the direct actor URL format without task/ path
-                    alt_url = f"https://api.apify.com/v2/acts/{actor_id}/run-sync?token={APIFY_API_TOKEN}"
-                    print(f"First URL format failed, trying direct actor URL: {alt_url.replace(APIFY_API_TOKEN, '***')}")
-                    
-                    async with session.post(alt_url, json=run_input, headers=headers) as alt_response:
-                        print(f"Alternative URL response status: {alt_response.status}")
-                        alt_text = await alt_response.text()
-                        
-                        if alt_response.status not in [200, 201]:
-                            raise Exception(f"Apify API error with both URL formats: {response.status} - {response_text[:100]}")
-                        
-                        # Use the successful alternative response
-                        response = alt_response
-                        response_text = alt_text
-                
-                # Parse response to get run ID
-                try:
-                    run_data = json.loads(response_text)
-                    run_id = run_data.get("id") or run_data.get("data", {}).get("id")
-                    if not run_id:
-                        raise Exception("No run ID returned from Apify API")
-                    
-                    print(f"Started Apify run with ID: {run_id}")
-                    
-                    # Poll for results with exponential backoff - use the correct formats
-                    # Try different URL formats for polling
-                    poll_urls = [
-                        f"https://api.apify.com/v2/acts/runs/{run_id}/dataset/items?token={APIFY_API_TOKEN}",
-                        f"https://api.apify.com/v2/acts/{actor_id}/runs/{run_id}/dataset/items?token={APIFY_API_TOKEN}"
-                    ]
-                    
-                    max_attempts = 15  # More attempts for longer-running scrapes
-                    for attempt in range(1, max_attempts + 1):
-                        wait_time = 5 * attempt  # Increasing backoff
-                        print(f"Waiting {wait_time} seconds before polling (attempt {attempt}/{max_attempts})...")
-                        await asyncio.sleep(wait_time)
-                        
-                        # Try each polling URL format
-                        for poll_url in poll_urls:
-                            print(f"Polling URL: {poll_url.replace(APIFY_API_TOKEN, '***')}")
-                            try:
-                                async with session.get(poll_url) as poll_response:
-                                    print(f"Poll response status: {poll_response.status}")
-                                    
-                                    if poll_response.status == 200:
-                                        poll_text = await poll_response.text()
-                                        if poll_text and poll_text.strip() and poll_text != "[]":
-                                            print(f"Got data from polling, size: {len(poll_text)} bytes")
-                                            return await process_json_response(poll_text, platform)
-                                        else:
-                                            print("Empty result, actor may still be running")
-                                    elif poll_response.status == 404:
-                                        print("Dataset not yet available with this URL format")
-                                    else:
-                                        print(f"Unexpected status from polling: {poll_response.status}")
-                            except Exception as e:
-                                print(f"Error during polling with URL {poll_url.replace(APIFY_API_TOKEN, '***')}: {str(e)}")
-                    
-                    # If we get here, all polling attempts failed
-                    raise Exception(f"Timeout waiting for results from Apify actor {actor_id}")
-                    
-                except json.JSONDecodeError:
-                    raise Exception(f"Invalid JSON response from Apify: {response_text[:100]}")
-                    
+        session = await get_session()
+        headers = {"Content-Type": "application/json"}
+
+        # Run the actor and get the dataset items in one request
+        async with session.post(apify_url, data=orjson.dumps(run_input), headers=headers, timeout=RUN_SYNC_TIMEOUT) as response:
+            logger.debug("Apify run-sync response status: %s", response.status)
+
+            if response.status in [200, 201]:
+                return await process_json_response(response, platform)
+
+        # Sync endpoint failed - fall back to the older start-run + poll flow
+        logger.warning("run-sync endpoint failed with status %s, falling back to polling", response.status)
+        return await _scrape_with_polling(session, actor_id, run_input, platform)
+
+    except ApifyError:
+        raise
+    except asyncio.TimeoutError as e:
+        logger.warning("Timeout talking to Apify: %s", e)
+        raise ApifyTimeoutError(f"Timed out accessing {platform.value} profile")
     except Exception as e:
-        print(f"Error using Apify API: {str(e)}")
-        raise Exception(f"Error accessing {platform.value} profile: {str(e)}")
+        logger.warning("Error using Apify API: %s", e)
+        raise ApifyError(f"Error accessing {platform.value} profile: {str(e)}")
+
+# Fallback scrape path: start an actor run and poll its dataset until ready
+async def _scrape_with_polling(session, actor_id, run_input, platform):
+    runs_url = f"https://api.apify.com/v2/acts/{actor_id}/runs"
+    headers = {"Content-Type": "application/json"}
+
+    # Start the actor run
+    async with session.post(runs_url, data=orjson.dumps(run_input), headers=headers, timeout=DEFAULT_TIMEOUT) as response:
+        logger.debug("Apify start run response status: %s", response.status)
+
+        if response.status == 429:
+            raise ApifyRateLimitError(f"Apify rate limit hit: {await _preview(response, 100)}")
+        if response.status in [402, 403]:
+            raise ApifyQuotaError(f"Apify account issue: {await _preview(response, 100)}")
+        if response.status not in [200, 201]:
+            raise ApifyError(f"Apify API error: {response.status} - {await _preview(response, 100)}")
+
+        # Parse response to get run ID
+        try:
+            run_data = await response.json(content_type=None, loads=orjson.loads)
+        except orjson.JSONDecodeError as e:
+            raise ApifyError(f"Invalid JSON response from Apify: {str(e)}")
+
+    run_id = run_data.get("id") or run_data.get("data", {}).get("id")
+    if not run_id:
+        raise ApifyError("No run ID returned from Apify API")
+
+    logger.debug("Started Apify run with ID: %s", run_id)
+
+    # Poll the run's dataset until items show up
+    poll_url = f"https://api.apify.com/v2/acts/{actor_id}/runs/{run_id}/dataset/items"
+
+    max_attempts = 10
+    base, cap = 1.0, 30.0
+    for attempt in range(1, max_attempts + 1):
+        # Capped exponential backoff with full jitter so concurrent callers
+        # don't synchronize their retries against the Apify API
+        delay = min(cap, base * (2 ** (attempt - 1)))
+        wait_time = random.uniform(0, delay)
+        logger.debug("Waiting %.1f seconds before polling (attempt %s/%s)...", wait_time, attempt, max_attempts)
+        await asyncio.sleep(wait_time)
+
+        logger.debug("Polling URL: %s", poll_url)
+        try:
+            async with session.get(poll_url, timeout=POLL_TIMEOUT) as poll_response:
+                logger.debug("Poll response status: %s", poll_response.status)
+
+                if poll_response.status == 200:
+                    poll_data = await poll_response.json(content_type=None, loads=orjson.loads)
+                    if poll_data:
+                        return process_response_data(poll_data, platform)
+                    else:
+                        logger.debug("Empty result, actor may still be running")
+                elif poll_response.status == 404:
+                    logger.debug("Dataset not yet available")
+                else:
+                    logger.debug("Unexpected status from polling: %s", poll_response.status)
+        except Exception as e:
+            logger.warning("Error during polling: %s", e)
+
+    # If we get here, all polling attempts failed
+    raise ApifyTimeoutError(f"Timeout waiting for results from Apify actor {actor_id}")
+
+# Cap concurrent Apify actor runs so a burst of inbound requests queues
+# instead of busting Apify's rate limits and triggering retry storms
+_APIFY_SEMAPHORE = asyncio.Semaphore(int(os.getenv("APIFY_MAX_CONCURRENCY", "8")))
+
+# Cache successful scrape responses so repeat requests for the same profile
+# don't trigger another Apify run (seconds of latency and real cost each)
+# Both structures are keyed by caller-supplied URLs on an unauthenticated
+# route, so they must be bounded: the cache evicts expired/overflow entries
+# itself, and idle locks are pruned once the table grows past the same cap
+_SCRAPE_CACHE_TTL = 300  # seconds
+_MAX_SCRAPE_LOCKS = 1024
+_scrape_cache: TTLCache = TTLCache(maxsize=1024, ttl=_SCRAPE_CACHE_TTL)  # normalized url -> ScrapeUrlResponse
+_scrape_locks: dict = {}  # normalized url -> asyncio.Lock (single-flight)
+
+def _cached_scrape_response(key):
+    return _scrape_cache.get(key)
+
+def _scrape_lock(key):
+    lock = _scrape_locks.get(key)
+    if lock is None:
+        if len(_scrape_locks) >= _MAX_SCRAPE_LOCKS:
+            for stale in [k for k, l in _scrape_locks.items() if not l.locked()]:
+                del _scrape_locks[stale]
+        lock = _scrape_locks.setdefault(key, asyncio.Lock())
+    return lock
+
+# User-facing messages per error type
+_ERROR_MESSAGES = {
+    ApifyQuotaError: "Apify account does not have sufficient credits. Please add credits to your Apify account.",
+    ApifyAuthError: "Error connecting to Apify API. Please check your API token.",
+    ApifyRateLimitError: "Rate limit exceeded. Please try again later.",
+    ApifyTimeoutError: "Request timed out. The social media platform may be responding slowly. Please try again later.",
+    ApifyNoDataError: "Could not retrieve data from the social media profile. The profile may be private or not exist.",
+}
 
 # Main scrape endpoint
 @router.post("/scrape", response_model=ScrapeUrlResponse)
 async def scrape_social_url(request: ScrapeUrlRequest):
-    print(f"Processing scrape request for URL: {request.url}")
+    logger.debug("Processing scrape request for URL: %s", request.url)
     url = request.url
 
+    # Serve from cache when the same URL was scraped recently
+    cache_key = url.strip().lower().rstrip('/')
+    cached = _cached_scrape_response(cache_key)
+    if cached:
+        logger.debug("Returning cached scrape result for %s", cache_key)
+        return cached
+
+    # Coalesce concurrent requests for the same URL into a single Apify run
+    lock = _scrape_lock(cache_key)
+    async with lock:
+        # Another request may have populated the cache while we waited
+        cached = _cached_scrape_response(cache_key)
+        if cached:
+            return cached
+        return await _scrape_and_cache(url, cache_key)
+
+async def _scrape_and_cache(url, cache_key):
     try:
         # Detect platform from URL
         platform = detect_platform_from_url(url)
@@ -425,37 +613,28 @@ async def scrape_social_url(request: ScrapeUrlRequest):
                 message="Could not detect social media platform from URL. Please provide a valid social media profile URL."
             )
 
-        print(f"Detected platform: {platform.value}")
+        logger.debug("Detected platform: %s", platform.value)
         
-        # Perform the scraping with Apify
-        profile_data = await scrape_profile_with_apify(url, platform)
+        # Perform the scraping with Apify, bounded by the concurrency cap
+        async with _APIFY_SEMAPHORE:
+            profile_data = await scrape_profile_with_apify(url, platform)
 
         # Create the profile object
         profile = SocialMediaProfile(**profile_data)
 
-        return ScrapeUrlResponse(
+        result = ScrapeUrlResponse(
             success=True,
             message=f"Successfully retrieved {platform.value} profile data.",
             data=profile
         )
+        _scrape_cache[cache_key] = result
+        return result
 
     except Exception as e:
-        print(f"Error scraping profile: {str(e)}")
-        error_msg = str(e)
-
-        # Return a more user-friendly message based on the error
-        if "funds" in error_msg or "credits" in error_msg:
-            message = "Apify account does not have sufficient credits. Please add credits to your Apify account."
-        elif "API error" in error_msg:
-            message = "Error connecting to Apify API. Please check your API token."
-        elif "Rate limit" in error_msg:
-            message = "Rate limit exceeded. Please try again later."
-        elif "timed out" in error_msg.lower() or "timeout" in error_msg.lower():
-            message = "Request timed out. The social media platform may be responding slowly. Please try again later."
-        elif "No data" in error_msg:
-            message = "Could not retrieve data from the social media profile. The profile may be private or not exist."
-        else:
-            message = f"Error retrieving profile data: {error_msg}"
+        logger.warning("Error scraping profile: %s", e)
+
+        # Map typed errors straight to their user-facing message
+        message = _ERROR_MESSAGES.get(type(e), f"Error retrieving profile data: {str(e)}")
 
         return ScrapeUrlResponse(
             success=False,
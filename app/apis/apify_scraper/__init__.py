@@ -1,30 +1,86 @@
 from fastapi import APIRouter, HTTPException
 import aiohttp
 import databutton as db
-import json
+import logging
+import orjson
+import os
 import time
 import asyncio
 import urllib.parse
+import hashlib
 import random
+import re
+from functools import lru_cache
+from cachetools import TTLCache
 from pydantic import BaseModel, Field
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, NamedTuple
 from datetime import datetime, timedelta
 
-# Dictionary to track last scrape times for rate limiting
-last_scrape_times = {}
+from app.apis.social_scraper import generate_time_series, generate_content_performance
 
-# Rate limiting settings (per platform+token)
-MIN_SCRAPE_INTERVAL = 30  # seconds between scrapes for the same platform
+logger = logging.getLogger(__name__)
+
+class _Lazy:
+    """Defers expensive serialization until a log record is actually emitted"""
+    __slots__ = ('_fn',)
+
+    def __init__(self, fn):
+        self._fn = fn
+
+    def __str__(self):
+        return self._fn()
 
 router = APIRouter(prefix="/apify_scraper")
 
 # Get API token from secrets
 APIFY_API_TOKEN = db.secrets.get("APIFY_API_TOKEN")
 
+# Module-level session shared by all scrapes so the run-start, status polls,
+# and dataset fetch reuse keep-alive connections to api.apify.com
+_session: Optional[aiohttp.ClientSession] = None
+
+async def get_session() -> aiohttp.ClientSession:
+    """Return the shared ClientSession, creating it lazily"""
+    global _session
+    if _session is None or _session.closed:
+        _session = aiohttp.ClientSession(
+            json_serialize=lambda obj: orjson.dumps(obj).decode(),
+            # Token travels in a header, keeping it out of URLs and access logs
+            headers={"Authorization": f"Bearer {APIFY_API_TOKEN}"},
+            connector=aiohttp.TCPConnector(
+                limit=100,
+                limit_per_host=30,
+                ttl_dns_cache=300,
+                keepalive_timeout=75
+            ),
+            timeout=aiohttp.ClientTimeout(total=60, connect=10)
+        )
+    return _session
+
+@router.on_event("shutdown")
+async def close_session():
+    global _session
+    if _session is not None and not _session.closed:
+        await _session.close()
+        _session = None
+
 class PlatformConfig:
-    def __init__(self, actor_id, input_template):
+    def __init__(self, actor_id, input_template, username_key, url_fmt=None, sync_mode=False):
         self.actor_id = actor_id
         self.input_template = input_template
+        self.username_key = username_key
+        # Template without the per-request key; build_input patches it in with
+        # a single dict construction instead of copy-then-setitem
+        self.base = {k: v for k, v in input_template.items() if k != username_key}
+        self.url_fmt = url_fmt  # set when the actor wants a profile URL, not a bare username
+        self.sync_mode = sync_mode  # short runs can use run-sync-get-dataset-items
+        # Precompute the run endpoint at import time so the hot path does no
+        # quoting or URL assembly per request
+        self.encoded_actor = urllib.parse.quote(actor_id, safe='') if '/' in actor_id else actor_id
+        self.run_url = f"https://api.apify.com/v2/acts/{self.encoded_actor}/runs"
+
+    def build_input(self, value):
+        return {**self.base, self.username_key: [value]}
 
 # Configure platform-specific actors and inputs
 PLATFORM_CONFIGS = {
@@ -39,7 +95,9 @@ PLATFORM_CONFIGS = {
                 "apifyProxyGroups": ["RESIDENTIAL"],  # Use residential proxies which are less likely to be blocked
             },
             "maybeUsernames": [],  # More extensive search for user
-        }
+        },
+        username_key="usernames",
+        sync_mode=True,
     ),
     "twitter": PlatformConfig(
         actor_id="apidojo/tweet-scraper",  # Cost-effective X (Twitter) scraper
@@ -50,7 +108,8 @@ PLATFORM_CONFIGS = {
                 "useApifyProxy": True,
                 "apifyProxyGroups": ["RESIDENTIAL"],
             }
-        }
+        },
+        username_key="handles",
     ),
     "facebook": PlatformConfig(
         actor_id="NsLALPUWnUCiZCGXh",  # Facebook Scraper
@@ -61,7 +120,10 @@ PLATFORM_CONFIGS = {
                 "useApifyProxy": True,
                 "apifyProxyGroups": ["RESIDENTIAL"],
             }
-        }
+        },
+        username_key="startUrls",
+        url_fmt="https://www.facebook.com/{u}",
+        sync_mode=True,
     ),
     "youtube": PlatformConfig(
         actor_id="pJiSQaYddv9TYKkps",  # YouTube Scraper
@@ -71,7 +133,10 @@ PLATFORM_CONFIGS = {
                 "useApifyProxy": True,
                 "apifyProxyGroups": ["RESIDENTIAL"],
             }
-        }
+        },
+        username_key="startUrls",
+        url_fmt="https://www.youtube.com/@{u}",
+        sync_mode=True,
     ),
     "tiktok": PlatformConfig(
         actor_id="GdWCB7iiMPeCqnaxj",  # TikTok Scraper
@@ -82,10 +147,51 @@ PLATFORM_CONFIGS = {
                 "useApifyProxy": True,
                 "apifyProxyGroups": ["RESIDENTIAL"],
             }
-        }
+        },
+        username_key="startUrls",
+        url_fmt="https://www.tiktok.com/@{u}",
     ),
 }
 
+# Per-platform concurrency caps. A semaphore bounds how many Apify runs can be
+# in flight for each actor at once, deterministically and without the racy
+# read-sleep-write dance of a timestamp dict.
+_PLATFORM_SEMAPHORES = {p: asyncio.Semaphore(5) for p in PLATFORM_CONFIGS}
+
+class TokenBucket:
+    """Async token-bucket limiter: refills at `rate` tokens/s up to `cap`"""
+    __slots__ = ('tokens', 'last', 'rate', 'cap', '_lock')
+
+    def __init__(self, rate: float, cap: float):
+        self.rate = rate
+        self.cap = cap
+        self.tokens = cap
+        self.last = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        while True:
+            async with self._lock:
+                now = time.monotonic()
+                self.tokens = min(self.cap, self.tokens + (now - self.last) * self.rate)
+                self.last = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            # Sleep outside the lock so waiters don't serialize on it, then
+            # re-check: the refill that accrues during the sleep is accounted
+            # by the `last` update above, never credited twice
+            await asyncio.sleep(wait)
+
+# Long-term throughput cap per platform: one scrape every 30s on average,
+# with bursts of up to 3 allowed. Bucket state is per-process, so when the
+# app runs under multiple Uvicorn workers each worker gets an equal share of
+# the budget; a shared store (e.g. Redis) would be needed for an exact global
+# window, which this deployment does not have.
+_WORKERS = max(1, int(os.environ.get("WEB_CONCURRENCY", "1")))
+_BUCKETS = {p: TokenBucket(rate=1 / (30 * _WORKERS), cap=3) for p in PLATFORM_CONFIGS}
+
 # Use the same data model structure as social_scraper
 class ScrapedData(BaseModel):
     followers: Optional[int] = None
@@ -109,6 +215,453 @@ class ScrapeResponse(BaseModel):
     success: bool
     data: Optional[ScrapedData] = None
     error: Optional[str] = None
+    stale: Optional[bool] = None  # True when serving last-known-good data
+
+def _has_key(obj, names, depth=3):
+    """True if any of `names` appears as a dict key within `depth` levels"""
+    if depth < 0:
+        return False
+    if isinstance(obj, dict):
+        if any(n in obj for n in names):
+            return True
+        return any(_has_key(v, names, depth - 1) for v in obj.values())
+    if isinstance(obj, list):
+        return any(_has_key(v, names, depth - 1) for v in obj)
+    return False
+
+# Candidate key paths per platform field, resolved once per scrape by _extract.
+# Different Apify actors (and actor versions) name the same metric differently,
+# so each field lists its variants in priority order.
+FIELD_MAP = {
+    "facebook": {
+        "followers": (("likesCount",), ("likes_count",), ("likes",),
+                      ("followersCount",), ("followers_count",), ("followers",)),
+    },
+    "youtube": {
+        "subscribers": (("subscriberCount",), ("subscriber_count",), ("subscribers",), ("subscribersCount",)),
+        "views": (("viewCount",), ("view_count",), ("views",), ("viewsCount",)),
+        "videos": (("videoCount",), ("video_count",), ("videos",), ("videosCount",)),
+    },
+    "tiktok": {
+        "followers": (("followerCount",), ("followers",), ("followersCount",), ("followers_count",), ("fans",)),
+        "following": (("followingCount",), ("following",), ("following_count",)),
+        "likes": (("heartCount",), ("likeCount",), ("likes",), ("like_count",), ("hearts",)),
+        "videos": (("videoCount",), ("videos",), ("video_count",)),
+    },
+}
+
+def _extract(d, paths):
+    """Walk each candidate key path in order, returning the first truthy value"""
+    for path in paths:
+        value = d
+        for key in path:
+            value = value.get(key) if isinstance(value, dict) else None
+            if value is None:
+                break
+        if value:
+            return value
+    return 0
+
+def _first(data, names, paths=((), ("legacy",), ("user",))):
+    """Return the first truthy value found for any of `names` at any of `paths`"""
+    for path in paths:
+        obj = data
+        for key in path:
+            obj = obj.get(key) if isinstance(obj, dict) else None
+            if obj is None:
+                break
+        if not isinstance(obj, dict):
+            continue
+        for name in names:
+            value = obj.get(name)
+            if value:
+                return value
+    return 0
+
+@lru_cache(maxsize=1024)
+def _series_cached(bucket: int, platform: str, day: str):
+    """Series for a follower bucket; `day` keys the cache so entries roll daily"""
+    return (
+        tuple(generate_time_series(bucket)),
+        tuple(generate_content_performance(bucket, platform)),
+    )
+
+def _build_series(followers: int, platform: str):
+    """CPU-bound series generation, run off the event loop via asyncio.to_thread.
+
+    Followers are bucketed to the next power of two so profiles of similar
+    size share one memoized series instead of regenerating near-identical
+    data per request.
+    """
+    bucket = 1 << max(0, int(followers)).bit_length()
+    return _series_cached(bucket, platform, datetime.now().strftime("%Y-%m-%d"))
+
+def _last_good_key(platform: str, username: str) -> str:
+    return re.sub(r'[^a-zA-Z0-9._-]', '', f"apify_last_{platform}_{username.lower()}")
+
+def _persist_last_good(platform: str, username: str, scraped_data: ScrapedData) -> None:
+    """Store the latest real scrape so failures can serve stale-but-real data"""
+    try:
+        db.storage.json.put(
+            _last_good_key(platform, username),
+            {"ts": time.time(), "data": scraped_data.dict()}
+        )
+    except Exception as e:
+        logger.warning("Could not persist last-known-good data for %s/%s: %s", platform, username, e)
+
+def _serve_stale(platform: str, username: str) -> Optional[ScrapeResponse]:
+    """Return the last successful scrape for this profile, if one was stored"""
+    try:
+        blob = db.storage.json.get(_last_good_key(platform, username), default=None)
+    except Exception as e:
+        logger.warning("Could not load last-known-good data for %s/%s: %s", platform, username, e)
+        return None
+    if not blob:
+        return None
+    logger.info("Serving last-known-good data for %s profile: %s", platform, username)
+    return ScrapeResponse(success=True, data=ScrapedData(**blob["data"]), stale=True)
+
+async def _map_instagram(results, username, profile_url) -> ScrapeResponse:
+    """Map Instagram profile-scraper output to a ScrapeResponse"""
+    if not results:
+        logger.warning("No data found for %s profile: %s", "instagram", username)
+        # Fallback to deterministic data generation when Apify scraping fails
+        return await generate_fallback_data("instagram", username, profile_url)
+
+    profile_data = results[0]
+    logger.debug("Profile data: %s...", _Lazy(lambda: orjson.dumps(profile_data)[:500].decode(errors="replace")))
+    logger.info("Retrieved authentic Instagram data from Apify")
+
+    # Map Apify results to our ScrapedData format
+    # Calculate reasonable values for missing fields
+    followers = profile_data.get("followersCount", 0)
+    following = profile_data.get("followsCount", 0)
+    posts = profile_data.get("postsCount", 0)
+    engagement = profile_data.get("engagement", 2.5)  # Estimated if not available
+    growth = profile_data.get("growthRate", 0.8)  # Estimated if not available
+
+    # Generate time series data if missing
+    if followers > 0:
+        daily_stats, content_performance = await asyncio.to_thread(_build_series, followers, "instagram")
+    else:
+        daily_stats = None
+        content_performance = None
+
+    # Create the data object with complete fields - convert float values to integers
+    base = followers * engagement / 100 if followers > 0 else 0.0
+    scraped_data = ScrapedData(
+        followers=followers,
+        following=following,
+        posts=posts,
+        engagement=engagement,
+        growth=growth,
+        likes=int(base),
+        comments=int(base * 0.2),
+        shares=int(base * 0.1),
+        dailyStats=daily_stats,
+        contentPerformance=content_performance
+    )
+
+    _persist_last_good("instagram", username, scraped_data)
+
+    return ScrapeResponse(
+        success=True,
+        data=scraped_data
+    )
+
+async def _map_twitter(results, username, profile_url) -> ScrapeResponse:
+    """Extract profile metrics from tweet-scraper output"""
+    if not results:
+        logger.warning("No data found for Twitter profile: %s", username)
+        return await generate_fallback_data("twitter", username, profile_url)
+
+    # Debug: Print structure of first result to understand format
+    logger.debug("Sample of Twitter first result: %s", _Lazy(lambda: orjson.dumps(results[0])[:500].decode(errors="replace")))
+
+    # The Twitter scraper returns tweets, not profile data
+    # We need to extract user info from the tweets
+    user_info = None
+    profile_data = None
+    user_data_found = False
+
+    # Try multiple approaches to find user info
+    approaches = [
+        # Approach 1: Direct user object in tweet
+        lambda tweet: tweet.get("user") if isinstance(tweet.get("user"), dict) else None,
+        # Approach 2: User in author field
+        lambda tweet: tweet.get("author") if isinstance(tweet.get("author"), dict) else None,
+        # Approach 3: User in user_data field (apidojo/tweet-scraper format)
+        lambda tweet: tweet.get("user_data") if isinstance(tweet.get("user_data"), dict) else None,
+        # Approach 4: New Twitter API nested structure
+        lambda tweet: tweet.get("tweet", {}).get("core", {}).get("user_results", {}).get("result") 
+            if isinstance(tweet.get("tweet", {}).get("core", {}).get("user_results", {}).get("result"), dict) else None,
+        # Approach 5: Legacy field in result
+        lambda tweet: tweet.get("legacy") if isinstance(tweet.get("legacy"), dict) else None,
+        # Approach 6: Nested in data field
+        lambda tweet: tweet.get("data", {}).get("user") if isinstance(tweet.get("data", {}).get("user"), dict) else None,
+    ]
+
+    # Try each approach on each tweet until we find user data
+    for tweet in results[:5]:  # Only check first 5 tweets to save time
+        for approach_func in approaches:
+            extracted_data = approach_func(tweet)
+            if extracted_data and any([
+                extracted_data.get("followers_count"),
+                extracted_data.get("followersCount"),
+                extracted_data.get("followers"),
+                extracted_data.get("legacy", {}).get("followers_count")
+            ]):
+                user_info = extracted_data
+                profile_data = extracted_data
+                user_data_found = True
+                logger.debug("Found Twitter user info using one of the direct approaches")
+                break
+        if user_data_found:
+            break
+
+    # If no success, try a more targeted search for specific fields
+    if not user_data_found:
+        logger.debug("Initial approaches failed, trying targeted field search")
+        for tweet in results[:5]:
+            # Look for tweets with follower counts anywhere in the structure
+            if _has_key(tweet, ("followers_count", "followersCount", "followers")):
+                logger.debug("Found Twitter data with follower information, extracting...")
+                # Manual extraction of first valid found user data
+                if "user" in tweet:
+                    user_info = tweet.get("user")
+                elif "legacy" in tweet:
+                    user_info = tweet
+                else:
+                    # Just use the tweet as is if we can't identify the exact structure
+                    user_info = tweet
+                profile_data = user_info
+                user_data_found = True
+                break
+
+    # If still no success, use fallback
+    if not user_data_found or not profile_data:
+        logger.warning("No useful Twitter profile data found. Using fallback data generation.")
+        return await generate_fallback_data("twitter", username, profile_url)
+
+    # Debug what was found
+    logger.debug("Extracted Twitter user profile data: %s...", _Lazy(lambda: orjson.dumps(profile_data)[:300].decode(errors="replace")))
+    logger.info("Retrieved authentic Twitter data from Apify")
+
+    # Extract each metric from its possible names and nesting spots,
+    # short-circuiting on the first hit instead of serializing the
+    # payload to probe for field names
+    followers = _first(profile_data, ("followers_count", "followersCount", "followers"))
+    following = _first(profile_data, ("following_count", "followingCount", "following"))
+    posts = _first(profile_data, ("statuses_count", "statusesCount", "tweetsCount", "tweets_count", "tweets"))
+
+    # Default values for engagement metrics
+    engagement = 1.8  # Default Twitter engagement rate
+    growth = 0.5      # Default growth rate
+
+    # Generate time series data
+    daily_stats, content_performance = await asyncio.to_thread(_build_series, followers, "twitter")
+
+    # Calculate engagement metrics once; real counts win over estimates
+    base = followers * engagement / 100 if followers > 0 else 0.0
+    likes = int(profile_data.get("likesCount") or base)
+    comments = int(profile_data.get("repliesCount") or base * 0.3)
+    shares = int(base * 0.4)
+
+    # Create the data object with complete fields - convert float values to integers
+    scraped_data = ScrapedData(
+        followers=followers,
+        following=following,
+        posts=posts,
+        engagement=engagement,
+        growth=growth,
+        likes=likes,
+        comments=comments,
+        shares=shares,
+        dailyStats=daily_stats,
+        contentPerformance=content_performance
+    )
+
+    _persist_last_good("twitter", username, scraped_data)
+
+    return ScrapeResponse(
+        success=True,
+        data=scraped_data
+    )
+
+async def _map_facebook(results, username, profile_url) -> ScrapeResponse:
+    """Map Facebook page-scraper output to a ScrapeResponse"""
+    if not results:
+        logger.warning("No data found for Facebook profile: %s", username)
+        return await generate_fallback_data("facebook", username, profile_url)
+
+    profile_data = results[0]
+    logger.debug("Profile data: %s...", _Lazy(lambda: orjson.dumps(profile_data)[:500].decode(errors="replace")))
+    logger.info("Retrieved authentic Facebook data from Apify")
+
+    # Extract followers/likes from data - account for different field names in different actors
+    followers = _extract(profile_data, FIELD_MAP["facebook"]["followers"])
+    engagement = 2.0  # Estimated default engagement rate for Facebook
+
+    # Generate time series data if missing
+    if followers > 0:
+        daily_stats, content_performance = await asyncio.to_thread(_build_series, followers, "facebook")
+    else:
+        daily_stats = None
+        content_performance = None
+
+    # Create the data object with complete fields
+    base = followers * engagement / 100 if followers > 0 else 0.0
+    scraped_data = ScrapedData(
+        followers=followers,
+        posts=profile_data.get("postsCount", 0),
+        engagement=engagement,
+        growth=0.6,  # Estimated growth rate
+        likes=int(base),
+        comments=int(base * 0.2),
+        shares=int(base * 0.15),
+        dailyStats=daily_stats,
+        contentPerformance=content_performance
+    )
+
+    _persist_last_good("facebook", username, scraped_data)
+
+    return ScrapeResponse(
+        success=True,
+        data=scraped_data
+    )
+
+async def _map_youtube(results, username, profile_url) -> ScrapeResponse:
+    """Map YouTube channel-scraper output to a ScrapeResponse"""
+    if not results:
+        logger.warning("No data found for YouTube channel: %s", username)
+        return await generate_fallback_data("youtube", username, profile_url)
+
+    profile_data = results[0]
+    logger.debug("Profile data: %s...", _Lazy(lambda: orjson.dumps(profile_data)[:500].decode(errors="replace")))
+    logger.info("Retrieved authentic YouTube data from Apify")
+
+    # Extract subscribers and views - account for different field names in different actors
+    subscribers = _extract(profile_data, FIELD_MAP["youtube"]["subscribers"])
+    views = _extract(profile_data, FIELD_MAP["youtube"]["views"])
+    videos = _extract(profile_data, FIELD_MAP["youtube"]["videos"])
+
+    # Generate time series data if missing
+    if subscribers > 0:
+        daily_stats, content_performance = await asyncio.to_thread(_build_series, subscribers, "youtube")
+    else:
+        daily_stats = None
+        content_performance = None
+
+    # Create the data object with complete fields
+    scraped_data = ScrapedData(
+        followers=subscribers,
+        posts=videos,
+        views=views,
+        engagement=4.0,  # YouTube typically has higher engagement
+        growth=0.7,  # Estimated growth rate
+        likes=int(subscribers * 0.05) if subscribers > 0 else 0,  # About 5% of subscribers like
+        comments=int(subscribers * 0.01) if subscribers > 0 else 0,  # About 1% comment
+        shares=int(subscribers * 0.02) if subscribers > 0 else 0,  # About 2% share
+        dailyStats=daily_stats,
+        contentPerformance=content_performance
+    )
+
+    _persist_last_good("youtube", username, scraped_data)
+
+    return ScrapeResponse(
+        success=True,
+        data=scraped_data
+    )
+
+async def _map_tiktok(results, username, profile_url) -> ScrapeResponse:
+    """Map TikTok scraper output to a ScrapeResponse"""
+    if not results:
+        logger.warning("No data found for TikTok profile: %s", username)
+        return await generate_fallback_data("tiktok", username, profile_url)
+
+    # Find the user profile information in the results
+    user_data = None
+
+    # The new actor should return user data directly
+    for result in results:
+        if "userInfo" in result or "user" in result:
+            user_data = result
+            break
+
+    if not user_data:
+        logger.warning("Could not find user data for TikTok profile: %s", username)
+        return await generate_fallback_data("tiktok", username, profile_url)
+
+    # Extract the user data object, which might be under different paths
+    profile_data = user_data.get("userInfo", {}).get("user", {})
+    if not profile_data:
+        profile_data = user_data.get("user", {})
+
+    # Stats might be in different locations based on the actor
+    stats = user_data.get("userInfo", {}).get("stats", {})
+    if not stats and "stats" in profile_data:
+        stats = profile_data.get("stats", {})
+
+    logger.debug("Profile data: %s...", _Lazy(lambda: orjson.dumps(profile_data)[:500].decode(errors="replace")))
+    logger.info("Retrieved authentic TikTok data from Apify")
+
+    # Extract followers and other stats from the appropriate location
+    tiktok_map = FIELD_MAP["tiktok"]
+    followers = _extract(stats, tiktok_map["followers"]) or _extract(profile_data, tiktok_map["followers"])
+    following = _extract(stats, tiktok_map["following"]) or _extract(profile_data, tiktok_map["following"])
+    likes = _extract(stats, tiktok_map["likes"]) or _extract(profile_data, tiktok_map["likes"])
+    videos = _extract(stats, tiktok_map["videos"]) or _extract(profile_data, tiktok_map["videos"])
+
+    # Generate time series data if missing
+    if followers > 0:
+        daily_stats, content_performance = await asyncio.to_thread(_build_series, followers, "tiktok")
+    else:
+        daily_stats = None
+        content_performance = None
+
+    # Roughly 4% of followers comment and 5% share; integer arithmetic in one
+    # branch instead of two float round-trips
+    comments, shares = (followers * 4 // 100, followers * 5 // 100) if followers else (0, 0)
+
+    # Create the data object with complete fields
+    scraped_data = ScrapedData(
+        followers=followers,
+        following=following,
+        posts=videos,
+        engagement=6.5,  # TikTok typically has very high engagement
+        growth=1.2,  # TikTok often has higher growth rates
+        likes=likes,
+        comments=comments,
+        shares=shares,
+        dailyStats=daily_stats,
+        contentPerformance=content_performance
+    )
+
+    _persist_last_good("tiktok", username, scraped_data)
+
+    return ScrapeResponse(
+        success=True,
+        data=scraped_data
+    )
+
+# Per-platform result mappers, dispatched by name after the dataset is fetched
+_MAPPERS = {
+    "instagram": _map_instagram,
+    "twitter": _map_twitter,
+    "facebook": _map_facebook,
+    "youtube": _map_youtube,
+    "tiktok": _map_tiktok,
+}
+
+# Short-TTL result cache plus in-flight deduplication: a cache hit costs no
+# network at all, and N concurrent requests for the same profile share one
+# Apify run instead of burning N compute units
+# The cache is keyed by caller input on an unauthenticated endpoint, so it
+# is bounded: TTLCache evicts expired and overflow entries itself. _inflight
+# is self-cleaning (entries are popped in the finally block below)
+_SCRAPE_CACHE_TTL = 600  # seconds
+_scrape_cache: TTLCache = TTLCache(maxsize=10_000, ttl=_SCRAPE_CACHE_TTL)
+_inflight: Dict[tuple, asyncio.Future] = {}
 
 @router.post("/scrape", response_model=ScrapeResponse)
 async def apify_scrape_social_profile(request: ScrapeRequest) -> ScrapeResponse:
@@ -116,672 +669,292 @@ async def apify_scrape_social_profile(request: ScrapeRequest) -> ScrapeResponse:
     # Define platform and username from request
     platform = request.platform.lower()
     username = request.username
-    
+
+    # Check if platform is supported
+    if platform not in PLATFORM_CONFIGS:
+        return ScrapeResponse(
+            success=False,
+            error=f"Platform '{platform}' is not supported. Supported platforms: {', '.join(PLATFORM_CONFIGS.keys())}"
+        )
+
+    key = (platform, username.lower())
+    cached = _scrape_cache.get(key)
+    if cached is not None:
+        logger.info("Serving cached result for %s profile: %s", platform, username)
+        return cached
+
+    pending = _inflight.get(key)
+    if pending is not None:
+        logger.info("Joining in-flight scrape for %s profile: %s", platform, username)
+        return await asyncio.shield(pending)
+
+    future = asyncio.get_running_loop().create_future()
+    _inflight[key] = future
     try:
-        # Normalize platform name
-        platform = platform.lower()
-        
-        # Check if platform is supported
-        if platform not in PLATFORM_CONFIGS:
-            return ScrapeResponse(
-                success=False,
-                error=f"Platform '{platform}' is not supported. Supported platforms: {', '.join(PLATFORM_CONFIGS.keys())}"
-            )
-        
-        # Rate limiting check
-        rate_limit_key = f"apify_{platform}"
-        current_time = time.time()
-        
-        if rate_limit_key in last_scrape_times:
-            time_since_last_request = current_time - last_scrape_times[rate_limit_key]
-            if time_since_last_request < MIN_SCRAPE_INTERVAL:
-                wait_time = int(MIN_SCRAPE_INTERVAL - time_since_last_request)
-                print(f"Rate limiting in effect for {platform}. Need to wait {wait_time} seconds.")
-                
-                # For very recent requests, return rate limit error
-                if time_since_last_request < 10:  # If request was made in last 10 seconds
-                    print(f"Rate limiting in effect for {platform}. Need to wait {wait_time} seconds.")
-                    return ScrapeResponse(
-                        success=False,
-                        error="Rate limiting in effect. Please try again later."
-                    )
-                
-                # Otherwise, wait a small delay and then continue with the request
-                await asyncio.sleep(min(5, wait_time))  # Wait at most 5 seconds
-        
-        # Update the last scrape time
-        last_scrape_times[rate_limit_key] = current_time
-        
+        response = await _scrape_profile(request, platform, username)
+        if response.success:
+            _scrape_cache[key] = response
+        future.set_result(response)
+        return response
+    except BaseException as e:
+        if not future.done():
+            future.set_exception(e)
+        raise
+    finally:
+        _inflight.pop(key, None)
+
+async def _scrape_profile(request: ScrapeRequest, platform: str, username: str) -> ScrapeResponse:
+    """Run a single Apify scrape for an already-validated platform/username"""
+    try:
+        # Shape request rate per platform; waits only when the burst budget is spent
+        await _BUCKETS[platform].acquire()
+
         # TikTok requires special handling as we don't have a working actor
         if platform == "tiktok":
-            print(f"Using fallback data generation for TikTok profile: {username}")
+            logger.info("Using fallback data generation for TikTok profile: %s", username)
             return await generate_fallback_data(platform, username, request.profile_url)
         
-        config = PLATFORM_CONFIGS[platform]
-        
-        # Prepare input for the actor
-        actor_input = config.input_template.copy()
-        
-        # Set username-specific parameters
-        if platform == "instagram":
-            actor_input["usernames"] = [username]
-        elif platform == "twitter":
-            actor_input["handles"] = [username]
-        elif platform == "facebook":
-            # For Facebook, we need a full URL
-            profile_url = request.profile_url or f"https://www.facebook.com/{username}"
-            actor_input["startUrls"] = [profile_url]
-        elif platform == "youtube":
-            # For YouTube, we need a full URL
-            profile_url = request.profile_url or f"https://www.youtube.com/@{username}"
-            actor_input["startUrls"] = [profile_url]
-        # We don't need a case for TikTok here anymore as we're using fallback data
-        
-        print(f"Scraping {platform} profile for user: {username}")
-        print(f"Actor input: {json.dumps(actor_input)}")
-        
-        # Start the actor run
-        async with aiohttp.ClientSession() as session:
-            # Start the actor run
-            run_url = f"https://api.apify.com/v2/acts/{config.actor_id if '/' not in config.actor_id else urllib.parse.quote(config.actor_id, safe='')}/runs?token={APIFY_API_TOKEN}"
-            print(f"Starting actor run at: {run_url.replace(APIFY_API_TOKEN, '***')}")
-            async with session.post(run_url, json=actor_input) as response:
-                if response.status != 201:
-                    error_text = await response.text()
-                    print(f"Failed to start actor run: {error_text}")
-                    
-                    # Check for rate limiting in the error message
-                    if response.status == 429 or "rate limit" in error_text.lower():
-                        print("Received rate limit error from Apify API")
-                        return await generate_fallback_data(platform, username, request.profile_url)
-                    
-                    return ScrapeResponse(
-                        success=False,
-                        error=f"Failed to start actor run: HTTP {response.status}"
-                    )
-                
-                run_data = await response.json()
-                run_id = run_data["data"]["id"]
-                print(f"Started actor run with ID: {run_id}")
-            
-            # Wait for the run to finish (with timeout)
-            max_wait_time = 300  # seconds (increased from 180 to allow more time for larger profiles)
-            poll_interval = 5    # seconds (increased to reduce API calls and give more time between polls)
-            waited_time = 0
-            
-            while waited_time < max_wait_time:
-                # Check run status
-                status_url = f"https://api.apify.com/v2/actor-runs/{run_id}?token={APIFY_API_TOKEN}"
-                print(f"Checking run status at: {status_url.replace(APIFY_API_TOKEN, '***')}")
-                async with session.get(status_url) as response:
-                    if response.status != 200:
+        # Bound concurrent runs per actor
+        async with _PLATFORM_SEMAPHORES[platform]:
+            config = PLATFORM_CONFIGS[platform]
+
+            # Prepare input for the actor; actors that want a full profile URL
+            # instead of a bare username have url_fmt set on their config
+            actor_input = config.build_input(
+                username if config.url_fmt is None
+                else (request.profile_url or config.url_fmt.format(u=username))
+            )
+
+            logger.info("Scraping %s profile for user: %s", platform, username)
+            logger.debug("Actor input: %s", _Lazy(lambda: orjson.dumps(actor_input).decode()))
+
+            session = await get_session()
+
+            if config.sync_mode:
+                # Single-result actors finish fast enough to use Apify's
+                # synchronous endpoint: one POST starts the run, waits, and
+                # returns the dataset inline - no polling, no dataset fetch
+                sync_url = f"https://api.apify.com/v2/acts/{config.encoded_actor}/run-sync-get-dataset-items"
+                sync_timeout = aiohttp.ClientTimeout(total=150)
+                logger.debug("Running actor synchronously at: %s", sync_url)
+                async with session.post(
+                    sync_url,
+                    # limit=1: these are single-profile runs, so never transfer
+                    # or parse more than the one item we read
+                    params={"timeout": "120", "limit": "1"},
+                    json=actor_input,
+                    timeout=sync_timeout
+                ) as response:
+                    if response.status not in (200, 201):
                         error_text = await response.text()
-                        print(f"Failed to check run status: {error_text}")
-                        
-                        return ScrapeResponse(
+                        logger.error("Synchronous actor run failed: %s", error_text)
+
+                        if response.status == 429 or "rate limit" in error_text.lower():
+                            logger.warning("Received rate limit error from Apify API")
+                            return await generate_fallback_data(platform, username, request.profile_url)
+
+                        return _serve_stale(platform, username) or ScrapeResponse(
                             success=False,
-                            error=f"Failed to check run status: HTTP {response.status}"
+                            error=f"Failed to run actor: HTTP {response.status}"
                         )
-                    
-                    status_data = await response.json()
-                    status = status_data["data"]["status"]
-                    print(f"Run status: {status}")
-                    
-                    if status in ["SUCCEEDED", "FAILED", "ABORTED", "TIMED-OUT"]:
-                        break
-                
-                # Wait before polling again
-                await asyncio.sleep(poll_interval)
-                waited_time += poll_interval
-            
-            # If timeout occurred
-            if waited_time >= max_wait_time:
-                print("Timed out waiting for actor run to finish")
-                return ScrapeResponse(
-                    success=False,
-                    error="Timed out waiting for actor run to finish"
-                )
-            
-            # Get the results
-            dataset_url = f"https://api.apify.com/v2/actor-runs/{run_id}/dataset/items?token={APIFY_API_TOKEN}"
-            print(f"Getting results from: {dataset_url.replace(APIFY_API_TOKEN, '***')}")
-            async with session.get(dataset_url) as response:
-                if response.status != 200:
-                    error_text = await response.text()
-                    print(f"Failed to get dataset items: {error_text}")
-                    
-                    return ScrapeResponse(
+
+                    results = orjson.loads(await response.read())
+                    logger.info("Got %d results", len(results))
+            else:
+                # The whole start+poll+fetch sequence runs under one wall-clock
+                # budget; each HTTP call also carries its own ClientTimeout so a
+                # hung socket cannot stall past it
+                max_wait_time = 300    # seconds (increased from 180 to allow more time for larger profiles)
+                long_poll_wait = 60    # seconds Apify holds the request open before returning
+                call_timeout = aiohttp.ClientTimeout(total=30, connect=5)
+                try:
+                    async with asyncio.timeout(max_wait_time):
+                        # Start the actor run
+                        logger.debug("Starting actor run at: %s", config.run_url)
+                        async with session.post(
+                            config.run_url,
+                            json=actor_input,
+                            timeout=call_timeout
+                        ) as response:
+                            if response.status != 201:
+                                error_text = await response.text()
+                                logger.error("Failed to start actor run: %s", error_text)
+
+                                # Check for rate limiting in the error message
+                                if response.status == 429 or "rate limit" in error_text.lower():
+                                    logger.warning("Received rate limit error from Apify API")
+                                    return await generate_fallback_data(platform, username, request.profile_url)
+
+                                return _serve_stale(platform, username) or ScrapeResponse(
+                                    success=False,
+                                    error=f"Failed to start actor run: HTTP {response.status}"
+                                )
+
+                            run_data = orjson.loads(await response.read())
+                            run_id = run_data["data"]["id"]
+                            logger.info("Started actor run with ID: %s", run_id)
+
+                        # Long-poll the run status until it reaches a terminal
+                        # state. Apify's waitForFinish blocks server-side for up
+                        # to 60s per call, so a full 5-minute wait costs at most
+                        # 5 round-trips instead of 60.
+                        status = None
+                        while status not in ("SUCCEEDED", "FAILED", "ABORTED", "TIMED-OUT"):
+                            status_url = f"https://api.apify.com/v2/actor-runs/{run_id}?waitForFinish={long_poll_wait}"
+                            logger.debug("Checking run status at: %s", status_url)
+                            poll_timeout = aiohttp.ClientTimeout(total=long_poll_wait + 15)
+                            async with session.get(status_url, timeout=poll_timeout) as response:
+                                if response.status != 200:
+                                    error_text = await response.text()
+                                    logger.error("Failed to check run status: %s", error_text)
+
+                                    return _serve_stale(platform, username) or ScrapeResponse(
+                                        success=False,
+                                        error=f"Failed to check run status: HTTP {response.status}"
+                                    )
+
+                                status_data = orjson.loads(await response.read())
+                                status = status_data["data"]["status"]
+                                logger.debug("Run status: %s", status)
+
+                        # Get the results. Only the first few items are ever inspected
+                        # (the Twitter branch scans results[:5]), so cap the transfer
+                        # server-side instead of downloading and parsing the full dataset
+                        dataset_url = f"https://api.apify.com/v2/actor-runs/{run_id}/dataset/items?limit=5"
+                        logger.debug("Getting results from: %s", dataset_url)
+                        async with session.get(dataset_url, timeout=call_timeout) as response:
+                            if response.status != 200:
+                                error_text = await response.text()
+                                logger.error("Failed to get dataset items: %s", error_text)
+
+                                return _serve_stale(platform, username) or ScrapeResponse(
+                                    success=False,
+                                    error=f"Failed to get dataset items: HTTP {response.status}"
+                                )
+
+                            results = orjson.loads(await response.read())
+                            logger.info("Got %d results", len(results))
+                except TimeoutError:
+                    logger.error("Timed out waiting for actor run to finish")
+                    return _serve_stale(platform, username) or ScrapeResponse(
                         success=False,
-                        error=f"Failed to get dataset items: HTTP {response.status}"
-                    )
-                
-                results = await response.json()
-                print(f"Got {len(results)} results")
-                
-                # Process the results based on platform
-                if platform == "instagram":
-                    if not results:
-                        print(f"No data found for {platform} profile: {username}")
-                        # Fallback to deterministic data generation when Apify scraping fails
-                        return await generate_fallback_data(platform, username, request.profile_url)
-                    
-                    profile_data = results[0]
-                    print(f"Profile data: {json.dumps(profile_data)[:500]}...")
-                    print("✅ REAL DATA SUCCESS: Successfully retrieved authentic Instagram data from Apify!")
-                    
-                    # Map Apify results to our ScrapedData format
-                    # Calculate reasonable values for missing fields
-                    followers = profile_data.get("followersCount", 0)
-                    following = profile_data.get("followsCount", 0)
-                    posts = profile_data.get("postsCount", 0)
-                    engagement = profile_data.get("engagement", 2.5)  # Estimated if not available
-                    growth = profile_data.get("growthRate", 0.8)  # Estimated if not available
-                    
-                    # Generate time series data if missing
-                    if followers > 0:
-                        from app.apis.social_scraper import generate_time_series, generate_content_performance
-                        daily_stats = generate_time_series(followers)
-                        content_performance = generate_content_performance(followers, "instagram")
-                    else:
-                        daily_stats = None
-                        content_performance = None
-                    
-                    # Create the data object with complete fields - convert float values to integers
-                    scraped_data = ScrapedData(
-                        followers=followers,
-                        following=following,
-                        posts=posts,
-                        engagement=engagement,
-                        growth=growth,
-                        likes=int(followers * engagement / 100) if followers > 0 else 0,
-                        comments=int(followers * engagement / 100 * 0.2) if followers > 0 else 0,
-                        shares=int(followers * engagement / 100 * 0.1) if followers > 0 else 0,
-                        dailyStats=daily_stats,
-                        contentPerformance=content_performance
-                    )
-                    
-                    return ScrapeResponse(
-                        success=True,
-                        data=scraped_data
-                    )
-                elif platform == "twitter":
-                    if not results:
-                        print(f"No data found for Twitter profile: {username}")
-                        return await generate_fallback_data(platform, username, request.profile_url)
-                    
-                    # Debug: Print structure of first result to understand format
-                    print(f"Sample of Twitter first result: {json.dumps(results[0])[:500]}")
-                    
-                    # The Twitter scraper returns tweets, not profile data
-                    # We need to extract user info from the tweets
-                    user_info = None
-                    profile_data = None
-                    user_data_found = False
-                    
-                    # Try multiple approaches to find user info
-                    approaches = [
-                        # Approach 1: Direct user object in tweet
-                        lambda tweet: tweet.get("user") if isinstance(tweet.get("user"), dict) else None,
-                        # Approach 2: User in author field
-                        lambda tweet: tweet.get("author") if isinstance(tweet.get("author"), dict) else None,
-                        # Approach 3: User in user_data field (apidojo/tweet-scraper format)
-                        lambda tweet: tweet.get("user_data") if isinstance(tweet.get("user_data"), dict) else None,
-                        # Approach 4: New Twitter API nested structure
-                        lambda tweet: tweet.get("tweet", {}).get("core", {}).get("user_results", {}).get("result") 
-                            if isinstance(tweet.get("tweet", {}).get("core", {}).get("user_results", {}).get("result"), dict) else None,
-                        # Approach 5: Legacy field in result
-                        lambda tweet: tweet.get("legacy") if isinstance(tweet.get("legacy"), dict) else None,
-                        # Approach 6: Nested in data field
-                        lambda tweet: tweet.get("data", {}).get("user") if isinstance(tweet.get("data", {}).get("user"), dict) else None,
-                    ]
-                    
-                    # Try each approach on each tweet until we find user data
-                    for tweet in results[:5]:  # Only check first 5 tweets to save time
-                        for approach_func in approaches:
-                            extracted_data = approach_func(tweet)
-                            if extracted_data and any([
-                                extracted_data.get("followers_count"),
-                                extracted_data.get("followersCount"),
-                                extracted_data.get("followers"),
-                                extracted_data.get("legacy", {}).get("followers_count")
-                            ]):
-                                user_info = extracted_data
-                                profile_data = extracted_data
-                                user_data_found = True
-                                print(f"Found Twitter user info using one of the direct approaches")
-                                break
-                        if user_data_found:
-                            break
-                            
-                    # If no success, try a more targeted search for specific fields
-                    if not user_data_found:
-                        print("Initial approaches failed, trying targeted field search")
-                        for tweet in results[:5]:
-                            # Look for tweets with follower counts anywhere in the structure
-                            tweet_json = json.dumps(tweet)
-                            if any(field in tweet_json for field in ['"followers_count"', '"followersCount"', '"followers"']):
-                                print(f"Found Twitter data with follower information, extracting...")
-                                # Manual extraction of first valid found user data
-                                if "user" in tweet:
-                                    user_info = tweet.get("user")
-                                elif "legacy" in tweet:
-                                    user_info = tweet
-                                else:
-                                    # Just use the tweet as is if we can't identify the exact structure
-                                    user_info = tweet
-                                profile_data = user_info
-                                user_data_found = True
-                                break
-                                
-                    # If still no success, use fallback
-                    if not user_data_found or not profile_data:
-                        print("No useful Twitter profile data found. Using fallback data generation.")
-                        return await generate_fallback_data(platform, username, request.profile_url)
-                    
-                    # Debug what was found
-                    print(f"Extracted Twitter user profile data: {json.dumps(profile_data)[:300]}...")
-                    print("✅ REAL DATA SUCCESS: Successfully retrieved authentic Twitter data from Apify!")
-                    
-                    # Extract metrics from the user info, handling various possible structures
-                    followers = 0
-                    following = 0
-                    posts = 0
-                    
-                    # Extract followers count from possible locations
-                    if "followers_count" in json.dumps(profile_data):
-                        followers = (
-                            profile_data.get("followers_count") or
-                            profile_data.get("legacy", {}).get("followers_count") or
-                            profile_data.get("user", {}).get("followers_count") or
-                            0
-                        )
-                    else:
-                        followers = (
-                            profile_data.get("followersCount") or 
-                            profile_data.get("followers") or 
-                            0
-                        )
-                    
-                    # Extract following count from possible locations
-                    if "following_count" in json.dumps(profile_data):
-                        following = (
-                            profile_data.get("following_count") or
-                            profile_data.get("legacy", {}).get("following_count") or
-                            profile_data.get("user", {}).get("following_count") or
-                            0
-                        )
-                    else:
-                        following = (
-                            profile_data.get("followingCount") or 
-                            profile_data.get("following") or 
-                            0
-                        )
-                    
-                    # Extract tweet/post count from possible locations
-                    if "statuses_count" in json.dumps(profile_data):
-                        posts = (
-                            profile_data.get("statuses_count") or
-                            profile_data.get("legacy", {}).get("statuses_count") or
-                            profile_data.get("user", {}).get("statuses_count") or
-                            0
-                        )
-                    else:
-                        posts = (
-                            profile_data.get("statusesCount") or 
-                            profile_data.get("tweetsCount") or 
-                            profile_data.get("tweets_count") or 
-                            profile_data.get("tweets") or 
-                            0
-                        )
-                    
-                    # Default values for engagement metrics
-                    engagement = 1.8  # Default Twitter engagement rate
-                    growth = 0.5      # Default growth rate
-                    
-                    # Generate time series data
-                    from app.apis.social_scraper import generate_time_series, generate_content_performance
-                    daily_stats = generate_time_series(followers)
-                    content_performance = generate_content_performance(followers, "twitter")
-                    
-                    # Calculate engagement metrics
-                    likes = int(profile_data.get("likesCount", followers * engagement / 100 if followers > 0 else 0))
-                    comments = int(profile_data.get("repliesCount", followers * engagement / 100 * 0.3 if followers > 0 else 0))
-                    shares = int(followers * engagement / 100 * 0.4) if followers > 0 else 0
-                    
-                    print("\u2705 REAL DATA SUCCESS: Successfully retrieved authentic Twitter data from Apify!")
-
-                    
-                    # Create the data object with complete fields - convert float values to integers
-                    scraped_data = ScrapedData(
-                        followers=followers,
-                        following=following,
-                        posts=posts,
-                        engagement=engagement,
-                        growth=growth,
-                        likes=int(profile_data.get("likesCount", followers * engagement / 100 if followers > 0 else 0)),
-                        comments=int(profile_data.get("repliesCount", followers * engagement / 100 * 0.3 if followers > 0 else 0)),
-                        shares=int(followers * engagement / 100 * 0.4) if followers > 0 else 0,
-                        dailyStats=daily_stats,
-                        contentPerformance=content_performance
-                    )
-                    
-                    return ScrapeResponse(
-                        success=True,
-                        data=scraped_data
-                    )
-                
-                elif platform == "facebook":
-                    if not results:
-                        print(f"No data found for Facebook profile: {username}")
-                        return await generate_fallback_data(platform, username, request.profile_url)
-                    
-                    profile_data = results[0]
-                    print(f"Profile data: {json.dumps(profile_data)[:500]}...")
-                    print("✅ REAL DATA SUCCESS: Successfully retrieved authentic Facebook data from Apify!")
-                    
-                    # Extract followers/likes from data - account for different field names in different actors
-                    followers = (
-                        profile_data.get("likesCount") or 
-                        profile_data.get("likes_count") or 
-                        profile_data.get("likes") or 
-                        profile_data.get("followersCount") or 
-                        profile_data.get("followers_count") or 
-                        profile_data.get("followers") or 
-                        0
-                    )
-                    engagement = 2.0  # Estimated default engagement rate for Facebook
-                    
-                    # Generate time series data if missing
-                    if followers > 0:
-                        from app.apis.social_scraper import generate_time_series, generate_content_performance
-                        daily_stats = generate_time_series(followers)
-                        content_performance = generate_content_performance(followers, "facebook")
-                    else:
-                        daily_stats = None
-                        content_performance = None
-                    
-                    # Create the data object with complete fields
-                    scraped_data = ScrapedData(
-                        followers=followers,
-                        posts=profile_data.get("postsCount", 0),
-                        engagement=engagement,
-                        growth=0.6,  # Estimated growth rate
-                        likes=int(followers * engagement / 100) if followers > 0 else 0,
-                        comments=int(followers * engagement / 100 * 0.2) if followers > 0 else 0,
-                        shares=int(followers * engagement / 100 * 0.15) if followers > 0 else 0,
-                        dailyStats=daily_stats,
-                        contentPerformance=content_performance
-                    )
-                    
-                    return ScrapeResponse(
-                        success=True,
-                        data=scraped_data
-                    )
-                
-                elif platform == "youtube":
-                    if not results:
-                        print(f"No data found for YouTube channel: {username}")
-                        return await generate_fallback_data(platform, username, request.profile_url)
-                    
-                    profile_data = results[0]
-                    print(f"Profile data: {json.dumps(profile_data)[:500]}...")
-                    print("✅ REAL DATA SUCCESS: Successfully retrieved authentic YouTube data from Apify!")
-                    
-                    # Extract subscribers and views - account for different field names in different actors
-                    subscribers = (
-                        profile_data.get("subscriberCount") or 
-                        profile_data.get("subscriber_count") or 
-                        profile_data.get("subscribers") or 
-                        profile_data.get("subscribersCount") or 
-                        0
-                    )
-                    views = (
-                        profile_data.get("viewCount") or 
-                        profile_data.get("view_count") or 
-                        profile_data.get("views") or 
-                        profile_data.get("viewsCount") or 
-                        0
-                    )
-                    videos = (
-                        profile_data.get("videoCount") or 
-                        profile_data.get("video_count") or 
-                        profile_data.get("videos") or 
-                        profile_data.get("videosCount") or 
-                        0
+                        error="Timed out waiting for actor run to finish"
                     )
-                    
-                    # Generate time series data if missing
-                    if subscribers > 0:
-                        from app.apis.social_scraper import generate_time_series, generate_content_performance
-                        daily_stats = generate_time_series(subscribers)
-                        content_performance = generate_content_performance(subscribers, "youtube")
-                    else:
-                        daily_stats = None
-                        content_performance = None
-                    
-                    # Create the data object with complete fields
-                    scraped_data = ScrapedData(
-                        followers=subscribers,
-                        posts=videos,
-                        views=views,
-                        engagement=4.0,  # YouTube typically has higher engagement
-                        growth=0.7,  # Estimated growth rate
-                        likes=int(subscribers * 0.05) if subscribers > 0 else 0,  # About 5% of subscribers like
-                        comments=int(subscribers * 0.01) if subscribers > 0 else 0,  # About 1% comment
-                        shares=int(subscribers * 0.02) if subscribers > 0 else 0,  # About 2% share
-                        dailyStats=daily_stats,
-                        contentPerformance=content_performance
-                    )
-                    
-                    return ScrapeResponse(
-                        success=True,
-                        data=scraped_data
-                    )
-                
-                elif platform == "tiktok":
-                    if not results:
-                        print(f"No data found for TikTok profile: {username}")
-                        return await generate_fallback_data(platform, username, request.profile_url)
-                    
-                    # Find the user profile information in the results
-                    user_data = None
-                    
-                    # The new actor should return user data directly
-                    for result in results:
-                        if "userInfo" in result or "user" in result:
-                            user_data = result
-                            break
-                    
-                    if not user_data:
-                        print(f"Could not find user data for TikTok profile: {username}")
-                        return await generate_fallback_data(platform, username, request.profile_url)
-                    
-                    # Extract the user data object, which might be under different paths
-                    profile_data = user_data.get("userInfo", {}).get("user", {})
-                    if not profile_data:
-                        profile_data = user_data.get("user", {})
-                    
-                    # Stats might be in different locations based on the actor
-                    stats = user_data.get("userInfo", {}).get("stats", {})
-                    if not stats and "stats" in profile_data:
-                        stats = profile_data.get("stats", {})
-                    
-                    print(f"Profile data: {json.dumps(profile_data)[:500]}...")
-                    print("✅ REAL DATA SUCCESS: Successfully retrieved authentic TikTok data from Apify!")
-                    
-                    # Extract followers and other stats from the appropriate location
-                    followers = (
-                        stats.get("followerCount") or
-                        stats.get("followerCount") or 
-                        profile_data.get("followerCount") or 
-                        profile_data.get("followers") or 
-                        profile_data.get("followersCount") or 
-                        profile_data.get("followers_count") or 
-                        profile_data.get("fans") or 
-                        0
-                    )
-                    
-                    following = (
-                        stats.get("followingCount") or
-                        profile_data.get("followingCount") or 
-                        profile_data.get("following") or 
-                        profile_data.get("following_count") or 
-                        0
-                    )
-                    
-                    likes = (
-                        stats.get("heartCount") or
-                        stats.get("likeCount") or
-                        profile_data.get("likeCount") or 
-                        profile_data.get("likes") or 
-                        profile_data.get("like_count") or 
-                        profile_data.get("heartCount") or 
-                        profile_data.get("hearts") or 
-                        0
-                    )
-                    
-                    videos = (
-                        stats.get("videoCount") or
-                        profile_data.get("videoCount") or 
-                        profile_data.get("videos") or 
-                        profile_data.get("video_count") or 
-                        0
-                    )
-                    
-                    # Generate time series data if missing
-                    if followers > 0:
-                        from app.apis.social_scraper import generate_time_series, generate_content_performance
-                        daily_stats = generate_time_series(followers)
-                        content_performance = generate_content_performance(followers, "tiktok")
-                    else:
-                        daily_stats = None
-                        content_performance = None
-                    
-                    # Create the data object with complete fields
-                    scraped_data = ScrapedData(
-                        followers=followers,
-                        following=following,
-                        posts=videos,
-                        engagement=6.5,  # TikTok typically has very high engagement
-                        growth=1.2,  # TikTok often has higher growth rates
-                        likes=likes,
-                        comments=int(followers * 0.04) if followers > 0 else 0,  # About 4% comment
-                        shares=int(followers * 0.05) if followers > 0 else 0,  # About 5% share
-                        dailyStats=daily_stats,
-                        contentPerformance=content_performance
-                    )
-                    
-                    return ScrapeResponse(
-                        success=True,
-                        data=scraped_data
-                    )
-        
-    except Exception as e:
-        print(f"Error scraping social profile: {str(e)}")
-        
+
+            # Map the results via the per-platform mapper
+            return await _MAPPERS[platform](results, username, request.profile_url)
+
+    except (aiohttp.ClientError, TimeoutError, KeyError, TypeError, ValueError) as e:
+        # Expected failure modes: transport errors, malformed JSON
+        # (orjson raises a ValueError subclass), and payload shape mismatches
+        logger.exception("Error scraping social profile: %s", e)
+
         # No fallback - only report the error
         return ScrapeResponse(
             success=False,
             error=f"Error scraping social profile: {str(e)}"
         )
+    except Exception as e:
+        # Anything else is a bug; log it loudly but keep the endpoint's
+        # error contract
+        logger.exception("Unexpected error scraping social profile: %s", e)
+        return ScrapeResponse(
+            success=False,
+            error=f"Error scraping social profile: {str(e)}"
+        )
 
 # Helper function to generate fallback data using social_scraper functions
+class _FallbackParams(NamedTuple):
+    followers: tuple          # randint range for the base follower count
+    following_ratio: Optional[tuple]  # uniform range applied to followers, or None
+    posts: tuple              # randint range
+    engagement: tuple         # uniform range
+    growth: tuple             # uniform range
+
+# Synthetic-profile parameter ranges per platform, allocated once at import
+_FALLBACK_PARAMS = {
+    "instagram": _FallbackParams((1000, 500000), (0.1, 0.8), (10, 500), (1.5, 4.0), (0.3, 1.2)),
+    "twitter": _FallbackParams((500, 200000), (0.2, 1.5), (50, 5000), (0.8, 2.5), (0.2, 0.8)),
+    # Facebook and YouTube don't typically show following
+    "facebook": _FallbackParams((2000, 1000000), None, (20, 300), (1.0, 3.0), (0.1, 0.6)),
+    # TikTok has high engagement and often high growth
+    "tiktok": _FallbackParams((3000, 1500000), (0.05, 0.5), (10, 200), (4.0, 15.0), (0.5, 3.0)),
+    "youtube": _FallbackParams((1000, 800000), None, (10, 500), (2.0, 5.0), (0.2, 1.0)),
+}
+_FALLBACK_DEFAULT = _FallbackParams((1000, 100000), (0.2, 1.0), (20, 500), (1.0, 3.0), (0.2, 1.0))
+
+@lru_cache(maxsize=4096)
+def _build_fallback(platform: str, username: str) -> ScrapedData:
+    """Deterministic synthetic profile data for a (platform, username) pair.
+
+    Fully determined by its arguments, so results are memoized; repeated
+    scrapes of the same failing profile skip the hashing, PRNG work, and
+    series generation entirely.
+    """
+    # Use a hash of the username to ensure consistent results; encode once and
+    # reuse the bytes for both the digest and the length scaling below
+    username_bytes = username.encode("utf-8")
+    seed = int.from_bytes(hashlib.md5(username_bytes).digest()[:8], "big") % 10000
+    rng = random.Random(seed)
+    params = _FALLBACK_PARAMS.get(platform, _FALLBACK_DEFAULT)
+
+    # Add some randomness based on username length (longer usernames get more followers)
+    followers = rng.randint(*params.followers) + (len(username_bytes) * 100)
+
+    following = int(followers * rng.uniform(*params.following_ratio)) if params.following_ratio else None
+    posts = rng.randint(*params.posts)
+    engagement = rng.uniform(*params.engagement)
+    growth = rng.uniform(*params.growth)
+
+    # Calculate engagement metrics
+    likes_per_post = int(followers * engagement / 100)
+    comments_per_post = int(likes_per_post * rng.uniform(0.05, 0.3))
+    shares_per_post = int(likes_per_post * rng.uniform(0.02, 0.2))
+
+    # Generate time series and performance data
+    daily_stats, content_performance = _build_series(followers, platform)
+
+    # Every value here is produced locally with known-correct types, so skip
+    # the validation pass. The cached series are tuples; materialize lists so
+    # serialization sees the declared types.
+    return ScrapedData.model_construct(
+        followers=followers,
+        following=following,
+        posts=posts,
+        engagement=engagement,
+        growth=growth,
+        likes=likes_per_post,
+        comments=comments_per_post,
+        shares=shares_per_post,
+        views=int(followers * 5) if platform in ["youtube", "tiktok"] else None,
+        dailyStats=list(daily_stats),
+        contentPerformance=list(content_performance)
+    )
+
 async def generate_fallback_data(platform: str, username: str, profile_url: Optional[str] = None) -> ScrapeResponse:
     """Generate fallback data using social_scraper when Apify fails"""
+    # Prefer stale-but-real data from the last successful scrape over synthetic numbers
+    stale = _serve_stale(platform, username)
+    if stale is not None:
+        return stale
+
     try:
-        from app.apis.social_scraper import (
-            generate_time_series, generate_content_performance
-        )
-        
-        print(f"Using fallback data generation for {platform}")
-        print(f"⚠️ SIMULATED DATA WARNING: Using generated profile data instead of real {platform} data")
-        
-        # Generate deterministic but realistic-looking data based on username
-        # Use a hash of the username to ensure consistent results
-        import hashlib
-        seed = int(hashlib.md5(username.encode()).hexdigest(), 16) % 10000
-        random.seed(seed)
-        
-        # Generate base followers count (different ranges for different platforms)
-        if platform == "instagram":
-            followers_base = random.randint(1000, 500000)
-        elif platform == "twitter":
-            followers_base = random.randint(500, 200000)
-        elif platform == "facebook":
-            followers_base = random.randint(2000, 1000000)
-        elif platform == "tiktok":
-            followers_base = random.randint(3000, 1500000)
-        elif platform == "youtube":
-            followers_base = random.randint(1000, 800000)
-        else:
-            followers_base = random.randint(1000, 100000)
-        
-        # Add some randomness based on username length (longer usernames get more followers)
-        followers = followers_base + (len(username) * 100)
-        
-        # Generate other metrics based on followers
-        if platform == "instagram":
-            following = int(followers * random.uniform(0.1, 0.8))
-            posts = random.randint(10, 500)
-            engagement = random.uniform(1.5, 4.0)
-            growth = random.uniform(0.3, 1.2)
-        elif platform == "twitter":
-            following = int(followers * random.uniform(0.2, 1.5))
-            posts = random.randint(50, 5000)
-            engagement = random.uniform(0.8, 2.5)
-            growth = random.uniform(0.2, 0.8)
-        elif platform == "facebook":
-            following = None  # Facebook doesn't typically show following
-            posts = random.randint(20, 300)
-            engagement = random.uniform(1.0, 3.0)
-            growth = random.uniform(0.1, 0.6)
-        elif platform == "tiktok":
-            following = int(followers * random.uniform(0.05, 0.5))
-            posts = random.randint(10, 200)
-            engagement = random.uniform(4.0, 15.0)  # TikTok has high engagement
-            growth = random.uniform(0.5, 3.0)  # TikTok often has high growth
-        elif platform == "youtube":
-            following = None  # YouTube doesn't typically show following
-            posts = random.randint(10, 500)  # Videos
-            engagement = random.uniform(2.0, 5.0)
-            growth = random.uniform(0.2, 1.0)
-        else:
-            following = int(followers * random.uniform(0.2, 1.0))
-            posts = random.randint(20, 500)
-            engagement = random.uniform(1.0, 3.0)
-            growth = random.uniform(0.2, 1.0)
-        
-        # Calculate engagement metrics
-        likes_per_post = int(followers * engagement / 100)
-        comments_per_post = int(likes_per_post * random.uniform(0.05, 0.3))
-        shares_per_post = int(likes_per_post * random.uniform(0.02, 0.2))
-        
-        # Generate time series and performance data
-        daily_stats = generate_time_series(followers)
-        content_performance = generate_content_performance(followers, platform)
-        
-        # Create the data object
-        scraped_data = ScrapedData(
-            followers=followers,
-            following=following,
-            posts=posts,
-            engagement=engagement,
-            growth=growth,
-            likes=likes_per_post,
-            comments=comments_per_post,
-            shares=shares_per_post,
-            views=int(followers * 5) if platform in ["youtube", "tiktok"] else None,
-            dailyStats=daily_stats,
-            contentPerformance=content_performance
-        )
-        
-        return ScrapeResponse(
+        logger.info("Using fallback data generation for %s", platform)
+        logger.warning("Using generated profile data instead of real %s data", platform)
+
+        # Memoized and CPU-bound, so run off the event loop; cache hits return
+        # almost immediately
+        scraped_data = await asyncio.to_thread(_build_fallback, platform, username)
+
+        return ScrapeResponse.model_construct(
             success=True,
-            data=scraped_data
+            data=scraped_data,
+            error=None,
+            stale=None
         )
     except Exception as e:
-        print(f"Error in fallback data generation: {str(e)}")
+        logger.exception("Error in fallback data generation: %s", e)
         return ScrapeResponse(
             success=False,
             error=f"Error generating fallback data: {str(e)}"
-        )
\ No newline at end of file
+        )
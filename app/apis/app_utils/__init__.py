@@ -1,6 +1,8 @@
 from fastapi import APIRouter
 from pydantic import BaseModel
 
+from app.apis.apify_integration import check_apify_connection as check_api
+
 router = APIRouter()
 
 class ApifyConnectionCheckResult(BaseModel):
@@ -10,17 +12,12 @@ class ApifyConnectionCheckResult(BaseModel):
 @router.get("/check-apify-connection2", response_model=ApifyConnectionCheckResult)
 async def check_apify_connection2():
     """Check if Apify API is connected and working properly"""
-    from app.apis.apify_integration import check_apify_connection as check_api
-    
     try:
-        # Call the Apify integration check endpoint
-        result = await check_api()
-        return ApifyConnectionCheckResult(
-            connected=result.connected,
-            message=result.message
-        )
+        # The integration's result already carries connected/message;
+        # response_model shapes it, so skip re-wrapping it in a second model
+        return await check_api()
     except Exception as e:
         return ApifyConnectionCheckResult(
             connected=False,
             message=f"Error checking Apify connection: {str(e)}"
-        )
\ No newline at end of file
+        )
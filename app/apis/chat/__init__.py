@@ -1,21 +1,43 @@
 import databutton as db
+import logging
 import re
 import json
 import time
+import asyncio
+import hashlib
+import heapq
+import httpx
+import orjson
 from datetime import datetime
-from openai import OpenAI
+from openai import AsyncOpenAI
 from fastapi import APIRouter, HTTPException, Depends
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel
-from typing import List, Optional, Dict, Any, cast
+from typing import List, Optional, Dict, Any, Sequence, cast
 from app.auth import AuthorizedUser
 import base64
+from collections import deque
+
+# Module logger; args are formatted lazily so failed-call logging stays
+# cheap even under heavy error rates (root config lives in main.py)
+logger = logging.getLogger(__name__)
 
 # Initialize router
 router = APIRouter(prefix="/api/chat")
 
-# Initialize OpenAI client
+# Initialize OpenAI client on a shared keep-alive transport so concurrent
+# chats reuse warm connections instead of paying a TLS handshake each
+_http_client = httpx.AsyncClient(
+    http2=True,
+    limits=httpx.Limits(max_connections=100, max_keepalive_connections=50),
+    timeout=httpx.Timeout(60.0, connect=5.0),
+)
 api_key = db.secrets.get("OPENAI_API_KEY")
-client = OpenAI(api_key=api_key)
+client = AsyncOpenAI(api_key=api_key, http_client=_http_client)
+
+@router.on_event("shutdown")
+async def close_http_client():
+    await _http_client.aclose()
 
 # OpenAI Assistant ID
 ASSISTANT_ID = "asst_zH2gNmtHevHg3ioE282EvCpZ"
@@ -25,10 +47,14 @@ def now_as_iso() -> str:
     """Generate current timestamp in ISO format"""
     return datetime.utcnow().isoformat() + "Z"
 
+# Regexes compiled once at import instead of per call
+_SANITIZE_RE = re.compile(r'[^a-zA-Z0-9._-]')
+_GENERATE_RE = re.compile(r'^generate\s+(.+)$', re.IGNORECASE)
+
 # Helper function to sanitize storage key
 def sanitize_storage_key(key: str) -> str:
     """Sanitize storage key to only allow alphanumeric and ._- symbols"""
-    return re.sub(r'[^a-zA-Z0-9._-]', '', key)
+    return _SANITIZE_RE.sub('', key)
 
 # Models for request and response
 class Message(BaseModel):
@@ -39,6 +65,7 @@ class ChatRequest(BaseModel):
     messages: List[Message]
     stream: bool = False
     image_data: Optional[str] = None
+    skip_context: bool = False  # Skip the account-context fetch entirely
 
 class ChatResponse(BaseModel):
     reply: str
@@ -48,8 +75,30 @@ class ChatHistoryResponse(BaseModel):
     history: List[Dict[str, Any]]
     usage: Dict[str, int]
 
-# System prompt for PR context
+# The rendered prompt is deterministic given the accounts payload, so cache
+# it keyed by a hash of the canonicalized JSON instead of rebuilding the
+# multi-KB string on every request
+_prompt_cache: Dict[bytes, str] = {}
+
 def get_system_prompt(social_accounts: List[Dict[str, Any]]) -> str:
+    try:
+        key = hashlib.blake2b(orjson.dumps(social_accounts, option=orjson.OPT_SORT_KEYS)).digest()
+    except TypeError:
+        # Payload contains something orjson can't serialize; render uncached
+        return _render_system_prompt(social_accounts)
+
+    cached = _prompt_cache.get(key)
+    if cached is not None:
+        return cached
+
+    prompt = _render_system_prompt(social_accounts)
+    if len(_prompt_cache) >= 1024:
+        _prompt_cache.clear()
+    _prompt_cache[key] = prompt
+    return prompt
+
+# System prompt for PR context
+def _render_system_prompt(social_accounts: List[Dict[str, Any]]) -> str:
     base_prompt = """
 You are a professional PR assistant for social media (PRSocials). Your goal is to help users improve their social media presence, engagement, and strategy.
 
@@ -88,55 +137,59 @@ Always maintain a focus on ethical PR practices and sustainable growth strategie
     if not social_accounts:
         return base_prompt + "\n\nNote: The user has not connected any social media accounts. Encourage them to connect their accounts for more personalized advice."
     
-    # Add information about connected accounts
-    accounts_data = "\n\nThe user has connected the following social media accounts. Use this data to provide personalized advice:\n"
+    # Add information about connected accounts; collect chunks and join once
+    # instead of growing a string with repeated +=
+    parts = ["\n\nThe user has connected the following social media accounts. Use this data to provide personalized advice:\n"]
     
     for idx, account in enumerate(social_accounts):
         platform = account.get("platform", "unknown")
         username = account.get("username", "unknown")
         platform_data = account.get("platformData", {})
         
-        accounts_data += f"\nAccount {idx+1}:\n"
-        accounts_data += f"- Platform: {platform}\n"
-        accounts_data += f"- Username: @{username}\n"
+        parts.append(f"\nAccount {idx+1}:\n")
+        parts.append(f"- Platform: {platform}\n")
+        parts.append(f"- Username: @{username}\n")
         
         # Add key metrics if available
         if platform_data:
-            accounts_data += "- Key metrics:\n"
+            parts.append("- Key metrics:\n")
             if "followers" in platform_data:
-                accounts_data += f"  * Followers: {platform_data['followers']}\n"
+                parts.append(f"  * Followers: {platform_data['followers']}\n")
             if "following" in platform_data:
-                accounts_data += f"  * Following: {platform_data['following']}\n"
+                parts.append(f"  * Following: {platform_data['following']}\n")
             if "posts" in platform_data:
-                accounts_data += f"  * Posts: {platform_data['posts']}\n"
+                parts.append(f"  * Posts: {platform_data['posts']}\n")
             if "engagement" in platform_data:
-                accounts_data += f"  * Engagement rate: {platform_data['engagement']}%\n"
+                parts.append(f"  * Engagement rate: {platform_data['engagement']}%\n")
             if "growth" in platform_data:
-                accounts_data += f"  * Growth rate: {platform_data['growth']}%\n"
+                parts.append(f"  * Growth rate: {platform_data['growth']}%\n")
             
             # Include recent performance if available
             if "dailyStats" in platform_data and platform_data["dailyStats"]:
                 recent_stats = platform_data["dailyStats"][-7:] if len(platform_data["dailyStats"]) > 7 else platform_data["dailyStats"]
                 
                 if recent_stats:
-                    accounts_data += "- Recent performance (last 7 days):\n"
+                    parts.append("- Recent performance (last 7 days):\n")
                     for day in recent_stats:
                         date = day.get("date", "")
                         followers = day.get("followers", 0)
                         engagement = day.get("engagement", 0)
-                        accounts_data += f"  * {date}: {followers} followers, {engagement}% engagement\n"
+                        parts.append(f"  * {date}: {followers} followers, {engagement}% engagement\n")
             
             # Include top content if available
             if "contentPerformance" in platform_data and platform_data["contentPerformance"]:
-                # Sort by engagement (likes + comments + shares)
-                top_content = sorted(
-                    platform_data["contentPerformance"],
-                    key=lambda x: (x.get("likes", 0) + x.get("comments", 0) + x.get("shares", 0)),
-                    reverse=True
-                )[:3]  # Get top 3
-                
+                # Prefer the top-3 precomputed in get_connected_accounts;
+                # only select by engagement here if it's missing
+                top_content = platform_data.get("topContent")
+                if top_content is None:
+                    top_content = heapq.nlargest(
+                        3,
+                        platform_data["contentPerformance"],
+                        key=lambda x: (x.get("likes", 0) + x.get("comments", 0) + x.get("shares", 0))
+                    )
+
                 if top_content:
-                    accounts_data += "- Top performing content:\n"
+                    parts.append("- Top performing content:\n")
                     for content in top_content:
                         title = content.get("title", "Untitled")
                         content_type = content.get("type", "post")
@@ -145,104 +198,169 @@ Always maintain a focus on ethical PR practices and sustainable growth strategie
                         shares = content.get("shares", 0)
                         date = content.get("date", "")
                         
-                        accounts_data += f"  * {title} ({content_type}) on {date}: {likes} likes, {comments} comments, {shares} shares\n"
+                        parts.append(f"  * {title} ({content_type}) on {date}: {likes} likes, {comments} comments, {shares} shares\n")
             
             # Include insights if available
             if "insights" in platform_data and platform_data["insights"]:
                 insights = platform_data["insights"]
-                accounts_data += "- Calculated insights:\n"
+                parts.append("- Calculated insights:\n")
                 
                 # Engagement trend
                 if "engagementTrend" in insights:
                     trend = insights["engagementTrend"]
                     direction = "increasing" if trend["direction"] == "up" else "decreasing"
-                    accounts_data += f"  * Engagement is {direction} by {abs(trend['value']):.1f}% over {trend['period']}\n"
+                    parts.append(f"  * Engagement is {direction} by {abs(trend['value']):.1f}% over {trend['period']}\n")
                 
                 # Follower growth
                 if "followerGrowth" in insights:
                     growth = insights["followerGrowth"]
                     direction = "growing" if growth["direction"] == "up" else "shrinking"
-                    accounts_data += f"  * Follower count is {direction} by {abs(growth['value']):.1f}% over {growth['period']}\n"
+                    parts.append(f"  * Follower count is {direction} by {abs(growth['value']):.1f}% over {growth['period']}\n")
                 
                 # Best content type
                 if "bestContentType" in insights:
                     best_type = insights["bestContentType"]
-                    accounts_data += f"  * Best performing content type: {best_type['type']} with average engagement of {best_type['avgEngagement']:.1f}\n"
+                    parts.append(f"  * Best performing content type: {best_type['type']} with average engagement of {best_type['avgEngagement']:.1f}\n")
     
     # Add guidance for using the data
-    accounts_data += "\n\nIMPORTANT INSTRUCTIONS FOR USING THIS DATA:\n"
-    accounts_data += "1. ALWAYS analyze and reference this social media data when providing advice\n"
-    accounts_data += "2. Point out specific trends, metrics, or patterns you notice in their data\n"
-    accounts_data += "3. Make clear connections between your recommendations and their actual metrics\n"
-    accounts_data += "4. Compare their performance to industry benchmarks where relevant\n"
-    accounts_data += "5. Highlight areas of strength and opportunities for improvement based on their data\n"
-    accounts_data += "6. When they ask about a specific account or platform, focus your analysis on that account's data\n"
-    accounts_data += "7. Suggest specific content types or strategies based on what's working well in their data\n"
-    accounts_data += "8. Always explain WHY you're making a recommendation based on their data\n"
+    parts.append("\n\nIMPORTANT INSTRUCTIONS FOR USING THIS DATA:\n")
+    parts.append("1. ALWAYS analyze and reference this social media data when providing advice\n")
+    parts.append("2. Point out specific trends, metrics, or patterns you notice in their data\n")
+    parts.append("3. Make clear connections between your recommendations and their actual metrics\n")
+    parts.append("4. Compare their performance to industry benchmarks where relevant\n")
+    parts.append("5. Highlight areas of strength and opportunities for improvement based on their data\n")
+    parts.append("6. When they ask about a specific account or platform, focus your analysis on that account's data\n")
+    parts.append("7. Suggest specific content types or strategies based on what's working well in their data\n")
+    parts.append("8. Always explain WHY you're making a recommendation based on their data\n")
     
-    return base_prompt + accounts_data
+    return base_prompt + "".join(parts)
+
+# Short-lived per-user caches so repeated chat/history calls don't refetch
+# the same Firestore documents; entries are (expiry_timestamp, value)
+_ACCOUNTS_CACHE_TTL = 60
+_USAGE_CACHE_TTL = 15
+_accounts_cache: Dict[str, tuple] = {}
+_usage_cache: Dict[str, tuple] = {}
+
+def invalidate_user_caches(user_id: str) -> None:
+    """Drop cached Firestore-derived data for a user after their documents
+    change, so the next read sees the write instead of a stale TTL entry"""
+    _accounts_cache.pop(user_id, None)
+    _usage_cache.pop(user_id, None)
+
+# Background tasks spawned off the response path; keeping references stops
+# the event loop from garbage-collecting them mid-flight
+_background_tasks: set = set()
+
+def run_in_background(coro) -> None:
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
 
 # Helper function to increment user's chat count
 async def increment_chat_count(user_id: str) -> None:
     try:
-        # Get current user profile from Firestore
-        from app.apis.firebase_admin import get_firestore
-        db_client = get_firestore()
+        # Bump the count with a single atomic server-side increment; no
+        # read-modify-write round-trip, no race between workers
+        from firebase_admin import firestore
+        from app.apis.firebase_admin import get_async_firestore
+        db_client = get_async_firestore()
         user_ref = db_client.collection("users").document(user_id)
-        user_doc = user_ref.get()
-        
-        if user_doc.exists:
-            user_data = user_doc.to_dict()
-            current_count = user_data.get("chatCount", 0)
-            
-            # Update chat count
-            user_ref.update({
-                "chatCount": current_count + 1
-            })
+        await user_ref.update({
+            "chatCount": firestore.Increment(1)
+        })
+
+        # The cached usage is stale now that the count changed
+        _usage_cache.pop(user_id, None)
     except Exception as e:
-        print(f"Error updating chat count: {e}")
+        logger.exception("Error updating chat count: %s", e)
         # Continue even if firebase update fails
         pass
 
+# Helper function to format inline image data as an OpenAI data URL. Base64
+# payloads can run to multiple MB, so only strip when whitespace is actually
+# present and prefix with a single concatenation instead of rebinding copies
+def _to_image_url(image_data: str) -> str:
+    if image_data[:1].isspace() or image_data[-1:].isspace():
+        image_data = image_data.strip()
+    if image_data.startswith('data:image/'):
+        return image_data  # Already properly formatted
+    # If it's just base64 data, add the proper prefix
+    return 'data:image/jpeg;base64,' + image_data
+
+# Helper function to load chat history, preferring the orjson/binary format
+# while still reading entries written by the old db.storage.json layout
+# Parsed histories keyed by storage key, remembered alongside the raw bytes
+# they were parsed from (or last serialized to). Every access still re-reads
+# the blob so writes from other workers are always seen; the cache only
+# skips the orjson parse when the bytes are unchanged since this worker last
+# touched them.
+_history_cache: Dict[str, tuple] = {}  # storage_key -> (raw bytes, deque)
+
+def _get_history(storage_key: str) -> deque:
+    try:
+        raw = db.storage.binary.get(storage_key, default=None)
+    except Exception:
+        raw = None
+
+    cached = _history_cache.get(storage_key)
+    if cached is not None and cached[0] == raw:
+        return cached[1]
+
+    try:
+        # Prefer the orjson/binary format, falling back to entries written
+        # by the old db.storage.json layout
+        entries = orjson.loads(raw) if raw else db.storage.json.get(storage_key, default=[])
+    except Exception:
+        entries = []
+
+    history = deque(entries, maxlen=50)
+    _history_cache[storage_key] = (raw, history)
+    return history
+
+def discard_history_cache(user_id: str) -> None:
+    """Forget a user's parsed history, e.g. after it is cleared in storage"""
+    _history_cache.pop(sanitize_storage_key(f"chat_history_{user_id}"), None)
+
 # Helper function to save chat history
-async def save_chat_history(user_id: str, messages: List[Message]) -> None:
+async def save_chat_history(user_id: str, messages: Sequence[Message]) -> None:
     try:
         # Save to storage
         storage_key = sanitize_storage_key(f"chat_history_{user_id}")
-        
-        # Get existing history or create new
-        try:
-            history = db.storage.json.get(storage_key, default=[])
-        except Exception:
-            history = []
-            
-        # Add new messages to history, keeping only the last 50 conversations
+
+        # Append to the freshly loaded history, bounded to the last 50
+        # conversations; the deque drops the oldest entry on append instead
+        # of reslicing the whole list each write.
         # Each conversation is a user message followed by an assistant message
-        history.append({"timestamp": now_as_iso(), "messages": [m.dict() for m in messages]})
-        
-        # Keep only the last 50 conversations
-        if len(history) > 50:
-            history = history[-50:]
-            
-        # Save updated history
-        db.storage.json.put(storage_key, history)
+        history = _get_history(storage_key)
+        history.append({"timestamp": now_as_iso(), "messages": [m.model_dump() for m in messages]})
+
+        # Save updated history and remember the bytes we wrote, so the next
+        # load can skip the parse if nothing changed in between
+        payload = orjson.dumps(list(history))
+        db.storage.binary.put(storage_key, payload)
+        _history_cache[storage_key] = (payload, history)
     except Exception as e:
-        print(f"Error saving chat history: {e}")
+        logger.exception("Error saving chat history: %s", e)
         # Continue even if history save fails
         pass
 
 # Helper function to get user's connected social accounts
 async def get_connected_accounts(user_id: str) -> List[Dict[str, Any]]:
+    cached = _accounts_cache.get(user_id)
+    if cached and cached[0] > time.time():
+        return cached[1]
+
     try:
         # Get user's connected social accounts from Firestore
-        from app.apis.firebase_admin import get_firestore
-        db_client = get_firestore()
-        
+        from app.apis.firebase_admin import get_async_firestore
+        db_client = get_async_firestore()
+
         # Query social_accounts collection for accounts linked to the user
         accounts_ref = db_client.collection("social_accounts").where("userId", "==", user_id)
         accounts = []
-        
-        for doc in accounts_ref.stream():
+
+        async for doc in accounts_ref.stream():
             account_data = doc.to_dict()
             # Add additional analytics calculation and insight generation
             if "platformData" in account_data:
@@ -267,28 +385,25 @@ async def get_connected_accounts(user_id: str) -> List[Dict[str, Any]]:
                         # Calculate best performing content type if contentPerformance is available
                         if "contentPerformance" in account_data["platformData"] and account_data["platformData"]["contentPerformance"]:
                             content = account_data["platformData"]["contentPerformance"]
-                            
-                            # Group by content type
-                            content_by_type = {}
+
+                            # Accumulate engagement totals and counts per type
+                            # in one pass instead of grouping items into
+                            # intermediate lists and re-summing each group
+                            type_totals: Dict[str, list] = {}
                             for item in content:
                                 content_type = item.get("type", "post")
-                                if content_type not in content_by_type:
-                                    content_by_type[content_type] = []
-                                content_by_type[content_type].append(item)
-                            
-                            # Calculate average engagement by type
-                            type_performance = {}
-                            for content_type, items in content_by_type.items():
-                                total_eng = sum([(item.get("likes", 0) + item.get("comments", 0) + item.get("shares", 0)) for item in items])
-                                avg_eng = total_eng / len(items) if items else 0
-                                type_performance[content_type] = avg_eng
-                            
-                            # Find best performing type
-                            if type_performance:
-                                best_type = max(type_performance.items(), key=lambda x: x[1])
+                                totals = type_totals.get(content_type)
+                                if totals is None:
+                                    totals = type_totals[content_type] = [0, 0]
+                                totals[0] += item.get("likes", 0) + item.get("comments", 0) + item.get("shares", 0)
+                                totals[1] += 1
+
+                            # Find best performing type by average engagement
+                            if type_totals:
+                                best_type, (total_eng, count) = max(type_totals.items(), key=lambda kv: kv[1][0] / kv[1][1])
                                 account_data["platformData"]["insights"]["bestContentType"] = {
-                                    "type": best_type[0],
-                                    "avgEngagement": best_type[1]
+                                    "type": best_type,
+                                    "avgEngagement": total_eng / count
                                 }
                         
                         # Calculate best posting days/times if we have enough data
@@ -304,71 +419,106 @@ async def get_connected_accounts(user_id: str) -> List[Dict[str, Any]]:
                                 "direction": "up" if growth_pct > 0 else "down",
                                 "period": f"{len(recent_stats)} days"
                             }
-            
+
+                # Precompute top content once here so prompt rendering doesn't
+                # re-sort the full content array on every chat turn
+                content = account_data["platformData"].get("contentPerformance")
+                if content:
+                    account_data["platformData"]["topContent"] = heapq.nlargest(
+                        3, content,
+                        key=lambda x: x.get("likes", 0) + x.get("comments", 0) + x.get("shares", 0)
+                    )
+
             accounts.append(account_data)
-            
+
+        _accounts_cache[user_id] = (time.time() + _ACCOUNTS_CACHE_TTL, accounts)
         return accounts
     except Exception as e:
-        print(f"Error fetching connected accounts: {e}")
+        logger.exception("Error fetching connected accounts: %s", e)
         return []
 
+# user_id -> thread_id mappings that have already been verified against
+# OpenAI this process; warm entries skip both the storage read and the
+# threads.retrieve round-trip on every chat request
+_thread_cache: Dict[str, str] = {}
+
+# Helper function honoring the request's skip_context flag so callers that
+# don't want personalized context avoid the accounts fetch entirely
+async def connected_accounts_for(request: ChatRequest, user_id: str) -> List[Dict[str, Any]]:
+    if request.skip_context:
+        return []
+    return await get_connected_accounts(user_id)
+
 # Helper function to get or create a thread for a user
 async def get_or_create_thread(user_id: str) -> str:
+    thread_id = _thread_cache.get(user_id)
+    if thread_id:
+        return thread_id
+
     try:
         # Look up thread ID in storage
         storage_key = sanitize_storage_key(f"assistant_thread_{user_id}")
-        
+
         try:
             thread_data = db.storage.json.get(storage_key)
             thread_id = thread_data.get("thread_id")
-            
-            # Verify thread exists
-            client.beta.threads.retrieve(thread_id)
+
+            # Verify thread exists (once per process; cache hits skip this)
+            await client.beta.threads.retrieve(thread_id)
+            _thread_cache[user_id] = thread_id
             return thread_id
         except Exception:
             # Create new thread if not found or invalid
-            thread = client.beta.threads.create()
-            
+            thread = await client.beta.threads.create()
+
             # Store thread ID
             db.storage.json.put(storage_key, {"thread_id": thread.id, "created_at": now_as_iso()})
+            _thread_cache[user_id] = thread.id
             return thread.id
     except Exception as e:
-        print(f"Error with thread management: {e}")
+        logger.exception("Error with thread management: %s", e)
         # Create a new thread as fallback
-        thread = client.beta.threads.create()
+        thread = await client.beta.threads.create()
         return thread.id
 
 # Helper function to get user's chat usage
 async def get_chat_usage(user_id: str) -> Dict[str, int]:
+    cached = _usage_cache.get(user_id)
+    if cached and cached[0] > time.time():
+        return cached[1]
+
     try:
         # Get current user profile from Firestore
-        from app.apis.firebase_admin import get_firestore
-        db_client = get_firestore()
+        from app.apis.firebase_admin import get_async_firestore
+        db_client = get_async_firestore()
         user_ref = db_client.collection("users").document(user_id)
-        user_doc = user_ref.get()
-        
+        user_doc = await user_ref.get()
+
         if user_doc.exists:
             user_data = user_doc.to_dict()
-            return {
+            usage = {
                 "used": user_data.get("chatCount", 0),
                 "limit": user_data.get("chatLimit", 2)  # Default to free tier limit
             }
-        return {"used": 0, "limit": 2}  # Default values
+        else:
+            usage = {"used": 0, "limit": 2}  # Default values
+
+        _usage_cache[user_id] = (time.time() + _USAGE_CACHE_TTL, usage)
+        return usage
     except Exception as e:
-        print(f"Error fetching chat usage: {e}")
+        logger.exception("Error fetching chat usage: %s", e)
         return {"used": 0, "limit": 2}  # Default values
 
-# Endpoint to get chat history
-@router.get("/history")
+# Endpoint to get chat history; histories run to hundreds of KB, so let
+# orjson do the response encoding instead of stdlib json
+@router.get("/history", response_class=ORJSONResponse)
 async def get_chat_history(user: AuthorizedUser) -> ChatHistoryResponse:
     storage_key = sanitize_storage_key(f"chat_history_{user.sub}")
-    
-    try:
-        # Get chat history
-        history = db.storage.json.get(storage_key, default=[])
-    except Exception:
-        history = []
-    
+
+    # Get chat history; a fresh read that reuses the parsed copy when the
+    # stored bytes haven't changed
+    history = list(_get_history(storage_key))
+
     # Get usage info
     usage = await get_chat_usage(user.sub)
     
@@ -377,195 +527,98 @@ async def get_chat_history(user: AuthorizedUser) -> ChatHistoryResponse:
 # Endpoint to chat with the PR assistant
 @router.post("/", tags=["stream"])
 async def chat(request: ChatRequest, user: AuthorizedUser):
-    # Get user's chat usage
-    usage = await get_chat_usage(user.sub)
-    
+    # If streaming is requested, use a Server-Sent Events response so each
+    # token arrives in a framed event instead of raw text/plain. Only the
+    # limit check is needed before handing off; the generator fetches its
+    # own context, so skip the thread and accounts round-trips here.
+    if request.stream:
+        usage = await get_chat_usage(user.sub)
+        if usage["used"] >= usage["limit"]:
+            raise HTTPException(status_code=402, detail="Chat limit reached. Please upgrade your subscription to continue chatting.")
+
+        from fastapi.responses import StreamingResponse
+        return StreamingResponse(
+            sse_events(stream_chat_response(request, user)),
+            media_type="text/event-stream",
+            # GZipMiddleware buffers streamed bodies until the gzip stream
+            # closes, which would hold every SSE event back until the end of
+            # the reply; an explicit Content-Encoding makes it pass the
+            # stream through untouched
+            headers={"Content-Encoding": "identity"},
+        )
+
+    # Fetch usage, the assistant thread, and connected accounts concurrently;
+    # each is an independent round-trip so they overlap instead of queueing
+    usage, thread_id, social_accounts = await asyncio.gather(
+        get_chat_usage(user.sub),
+        get_or_create_thread(user.sub),
+        connected_accounts_for(request, user.sub),
+    )
+
     # Check if user has reached their limit
     if usage["used"] >= usage["limit"]:
         raise HTTPException(status_code=402, detail="Chat limit reached. Please upgrade your subscription to continue chatting.")
-        
-    # If streaming is requested, use streaming response
-    if request.stream:
-        from fastapi.responses import StreamingResponse
-        return StreamingResponse(stream_chat_response(request, user), media_type="text/plain")
-    
+
     try:
-        # Get or create thread for this user
-        thread_id = await get_or_create_thread(user.sub)
-        
-        # Always get and provide social accounts info for better context awareness
-        social_accounts = await get_connected_accounts(user.sub)
-        
-        # Add context information if accounts are connected
-        if social_accounts:
-            account_context = """IMPORTANT USER CONTEXT - I HAVE THESE ACCOUNTS:
-"""
-            
-            for idx, account in enumerate(social_accounts):
-                platform = account.get("platform", "unknown")
-                username = account.get("username", "unknown")
-                platform_data = account.get("platformData", {})
-                
-                account_context += f"\n{idx+1}. {platform.upper()} ACCOUNT: @{username}\n"
-                
-                # Add key metrics
-                followers = platform_data.get("followers", "unknown")
-                following = platform_data.get("following", "unknown")
-                posts = platform_data.get("posts", "unknown")
-                engagement = platform_data.get("engagement", "unknown")
-                
-                account_context += f"   - Followers: {followers}\n"
-                if following != "unknown":
-                    account_context += f"   - Following: {following}\n"
-                account_context += f"   - Posts: {posts}\n"
-                account_context += f"   - Engagement Rate: {engagement}%\n"
-                
-                # Add insights if available
-                insights = platform_data.get("insights", {})
-                if insights:
-                    account_context += "\n   ANALYTICS INSIGHTS:\n"
-                    
-                    # Engagement trend
-                    if "engagementTrend" in insights:
-                        trend = insights["engagementTrend"]
-                        account_context += f"   - Engagement trend: {trend['direction'].upper()} {abs(trend['value']):.1f}% over {trend['period']}\n"
-                    
-                    # Follower growth
-                    if "followerGrowth" in insights:
-                        growth = insights["followerGrowth"]
-                        account_context += f"   - Follower growth: {growth['direction'].upper()} {abs(growth['value']):.1f}% over {growth['period']}\n"
-                    
-                    # Best content type
-                    if "bestContentType" in insights:
-                        best_type = insights["bestContentType"]
-                        account_context += f"   - Best performing content type: {best_type['type'].upper()} with avg engagement of {best_type['avgEngagement']:.1f}\n"
-                
-                # Add recent performance summary if available
-                if "dailyStats" in platform_data and platform_data["dailyStats"]:
-                    account_context += "\n   RECENT PERFORMANCE:\n"
-                    recent_stats = platform_data["dailyStats"][-3:] # Just show last 3 days to avoid too much text
-                    for day in recent_stats:
-                        date = day.get("date", "")
-                        day_followers = day.get("followers", 0)
-                        day_engagement = day.get("engagement", 0)
-                        account_context += f"   - {date}: {day_followers} followers, {day_engagement}% engagement\n"
-                
-                # Add top content if available
-                if "contentPerformance" in platform_data and platform_data["contentPerformance"]:
-                    top_content = platform_data["contentPerformance"][:2]  # Just show top 2 to avoid too much text
-                    if top_content:
-                        account_context += "\n   TOP PERFORMING CONTENT:\n"
-                        for content in top_content:
-                            title = content.get("title", "Untitled")
-                            content_type = content.get("type", "post")
-                            likes = content.get("likes", 0)
-                            comments = content.get("comments", 0)
-                            shares = content.get("shares", 0)
-                            date = content.get("date", "")
-                            account_context += f"   - {title} ({content_type}) on {date}: {likes} likes, {comments} comments, {shares} shares\n"
-            
-            account_context += "\nWhen I ask about 'my account' or 'my username' or any details about my accounts, ALWAYS reference this specific information directly. Analyze this data to provide personalized advice."
-            
-            # Add account information as a system message at the beginning
-            client.beta.threads.messages.create(
-                thread_id=thread_id,
-                role="user",
-                content=f"USER'S CONNECTED ACCOUNT INFO (PLEASE DIRECTLY REFERENCE THIS DATA WHEN ASKED ABOUT ACCOUNTS):\n{account_context}"
-            )
-        
+        # The account summary is delivered as per-run instructions below, so
+        # there is no separate context message to post to the thread
         # Add the user's message to the thread
         if request.image_data:
-            # If there's an image, create a message with both text and image
+            # If there's an image, create a message with both text and image,
+            # formatted as per OpenAI docs:
+            # https://platform.openai.com/docs/guides/vision
             message_content = [
-                {"type": "text", "text": request.messages[-1].content}
+                {"type": "text", "text": request.messages[-1].content},
+                {"type": "image_url", "image_url": {"url": _to_image_url(request.image_data)}}
             ]
-            
-            # Add image content with specific instructions for social media analysis
-            # Format as per OpenAI docs: https://platform.openai.com/docs/guides/vision
-            # Process the image data to ensure proper formatting
-            image_data = request.image_data.strip()
-            
-            # Format the image URL correctly for OpenAI API
-            if image_data.startswith('data:image/'):
-                image_url = image_data  # Already properly formatted
-            else:
-                # If it's just base64 data, add the proper prefix
-                image_url = f"data:image/jpeg;base64,{image_data}"
-                
-            message_content.append({
-                "type": "image_url", 
-                "image_url": {"url": image_url}
-            })
-            
+
             # Create message with image analysis prompt
-            client.beta.threads.messages.create(
+            await client.beta.threads.messages.create(
                 thread_id=thread_id,
                 role="user",
                 content=message_content
             )
         else:
             # Just text message
-            client.beta.threads.messages.create(
+            await client.beta.threads.messages.create(
                 thread_id=thread_id,
                 role="user",
                 content=request.messages[-1].content  # Just add the most recent message
             )
         
-        # Run the assistant on the thread
-        run = client.beta.threads.runs.create(
+        # Stream the run and assemble the reply from message deltas; the
+        # completion event arrives as soon as the run finishes, so there is
+        # no once-per-second runs.retrieve polling loop or trailing
+        # messages.list round-trip. The cached system prompt carries the
+        # connected-account data as a per-run instructions override.
+        reply_parts = []
+        async with client.beta.threads.runs.stream(
             thread_id=thread_id,
-            assistant_id=ASSISTANT_ID
-        )
-        
-        # Poll for the run to complete
-        max_wait = 60  # Maximum wait time in seconds
-        start_time = time.time()
-        while True:
-            run_status = client.beta.threads.runs.retrieve(
-                thread_id=thread_id,
-                run_id=run.id
-            )
-            
-            if run_status.status == "completed":
-                break
-            elif run_status.status in ["failed", "cancelled", "expired"]:
-                raise HTTPException(status_code=500, detail=f"Assistant run failed with status: {run_status.status}")
-            
-            # Check if we've exceeded max wait time
-            if time.time() - start_time > max_wait:
-                raise HTTPException(status_code=504, detail="Assistant response timed out")
-                
-            # Wait briefly before polling again
-            time.sleep(1)
-        
-        # Get the latest message from the assistant
-        messages = client.beta.threads.messages.list(
-            thread_id=thread_id,
-            order="desc",
-            limit=1
-        )
-        
-        # Extract the assistant's reply
-        assistant_message = messages.data[0]
-        if assistant_message.role != "assistant":
-            raise HTTPException(status_code=500, detail="Expected assistant reply but got something else")
-            
-        reply = ""
-        for content_part in assistant_message.content:
-            if content_part.type == "text":
-                reply += content_part.text.value
-        
-        # Save this interaction to history for compatibility
-        all_messages = request.messages.copy()
-        all_messages.append(Message(role="assistant", content=reply))
-        await save_chat_history(user.sub, all_messages)
-        
-        # Increment user's chat count
-        await increment_chat_count(user.sub)
-        
+            assistant_id=ASSISTANT_ID,
+            instructions=get_system_prompt(social_accounts)
+        ) as stream:
+            async for event in stream:
+                if event.event == "thread.message.delta":
+                    for content_part in event.data.delta.content or []:
+                        if content_part.type == "text" and content_part.text and content_part.text.value:
+                            reply_parts.append(content_part.text.value)
+                elif event.event in ("thread.run.failed", "thread.run.cancelled", "thread.run.expired"):
+                    raise HTTPException(status_code=500, detail=f"Assistant run failed with status: {event.data.status}")
+
+        reply = "".join(reply_parts)
+
+        # Save this interaction to history and bump the chat count off the
+        # response path; neither result affects the reply. The tuple extends
+        # the request messages without copying them into a new list first.
+        run_in_background(save_chat_history(user.sub, (*request.messages, Message(role="assistant", content=reply))))
+        run_in_background(increment_chat_count(user.sub))
+
         return ChatResponse(reply=reply, usage=None)  # We don't get token usage from Assistant API
         
     except Exception as e:
+        # The failure may be a stale cached thread (e.g. deleted on the
+        # OpenAI side); drop it so the next request re-verifies from storage
+        _thread_cache.pop(user.sub, None)
         raise HTTPException(status_code=500, detail=f"Error using OpenAI Assistant: {str(e)}")
 
 # Helper function to process the last message for potential image inclusion
@@ -574,18 +627,7 @@ def process_last_message(message: Message, image_data: Optional[str]) -> Dict:
     # If no image data, just return the message as is
     if not image_data:
         return {"role": message.role, "content": message.content}
-    
-    # Process the image data
-    image_data = image_data.strip()
-    
-    # Format the image URL correctly for OpenAI API
-    # If it already has the data:image prefix, use it as is, otherwise add it
-    if image_data.startswith('data:image/'):
-        image_url = image_data  # Already properly formatted
-    else:
-        # If it's just base64 data, add the proper prefix
-        image_url = f"data:image/jpeg;base64,{image_data}"
-    
+
     # Return a multimodal message
     return {
         "role": message.role,
@@ -594,20 +636,25 @@ def process_last_message(message: Message, image_data: Optional[str]) -> Dict:
             {
                 "type": "image_url",
                 "image_url": {
-                    "url": image_url,
+                    "url": _to_image_url(image_data),
                     "detail": "high"
                 }
             }
         ]
     }
 
+# Helper function to frame streamed text chunks as Server-Sent Events
+async def sse_events(chunks):
+    async for chunk in chunks:
+        yield b"data: " + orjson.dumps({"delta": chunk}) + b"\n\n"
+
 # Helper function to stream chat response
 async def stream_chat_response(request: ChatRequest, user: AuthorizedUser):
     try:
         # Process image generation requests directly in the chat
         if request.messages and request.messages[-1].role == "user":
             message_text = request.messages[-1].content.strip().lower()
-            generate_match = re.match(r'^generate\s+(.+)$', message_text, re.IGNORECASE)
+            generate_match = _GENERATE_RE.match(message_text)
             
             if generate_match:
                 prompt = generate_match.group(1).strip()
@@ -615,7 +662,7 @@ async def stream_chat_response(request: ChatRequest, user: AuthorizedUser):
                 
                 try:
                     # Generate image using OpenAI's DALL-E
-                    response = client.images.generate(
+                    response = await client.images.generate(
                         model="dall-e-3",
                         prompt=prompt,
                         n=1,
@@ -630,26 +677,25 @@ async def stream_chat_response(request: ChatRequest, user: AuthorizedUser):
                     # Respond with the image URL in markdown format
                     yield f"\nHere's the image I generated based on your prompt:\n\n![Generated image]({image_url})\n\nIs there anything specific about this image you'd like me to explain or any changes you'd like to make?"
                     
-                    # Save message to history
-                    all_messages = request.messages.copy()
-                    all_messages.append(Message(role="assistant", content=f"Here's the image I generated based on your prompt:\n\n![Generated image]({image_url})\n\nIs there anything specific about this image you'd like me to explain or any changes you'd like to make?"))
-                    await save_chat_history(user.sub, all_messages)
-                    
-                    # Increment chat count
-                    await increment_chat_count(user.sub)
+                    # Save message to history and increment chat count in parallel
+                    reply_message = Message(role="assistant", content=f"Here's the image I generated based on your prompt:\n\n![Generated image]({image_url})\n\nIs there anything specific about this image you'd like me to explain or any changes you'd like to make?")
+                    await asyncio.gather(
+                        save_chat_history(user.sub, (*request.messages, reply_message)),
+                        increment_chat_count(user.sub),
+                    )
                     return
                     
                 except Exception as e:
-                    print(f"Error generating image: {e}")
+                    logger.exception("Error generating image: %s", e)
                     yield f"\nI'm sorry, I couldn't generate that image. {str(e)}"
                     return
         
         # If we get here, proceed with regular chat processing
         # Always get and provide social accounts info for better context awareness
-        social_accounts = await get_connected_accounts(user.sub)
+        social_accounts = await connected_accounts_for(request, user.sub)
         
         # Start with the OpenAI chat completion API
-        completion = client.chat.completions.create(
+        completion = await client.chat.completions.create(
             model="gpt-4o",  # Using gpt-4o which has built-in vision capabilities
             messages=[
                 {"role": "system", "content": get_system_prompt(social_accounts)},
@@ -661,212 +707,27 @@ async def stream_chat_response(request: ChatRequest, user: AuthorizedUser):
             max_tokens=800,
         )
         
-        # Stream the response
-        accumulated_response = ""
-        for chunk in completion:
+        # Stream the response, collecting chunks for the history write in a
+        # list joined once rather than a growing string
+        response_parts = []
+        async for chunk in completion:
             if chunk.choices and chunk.choices[0].delta and chunk.choices[0].delta.content:
                 content = chunk.choices[0].delta.content
-                accumulated_response += content
+                response_parts.append(content)
                 yield content
+        accumulated_response = "".join(response_parts)
         
-        # Save to chat history
-        all_messages = request.messages.copy()
-        all_messages.append(Message(role="assistant", content=accumulated_response))
-        await save_chat_history(user.sub, all_messages)
-        
-        # Increment user's chat count
-        await increment_chat_count(user.sub)
+        # Save to chat history and increment the chat count in parallel
+        await asyncio.gather(
+            save_chat_history(user.sub, (*request.messages, Message(role="assistant", content=accumulated_response))),
+            increment_chat_count(user.sub),
+        )
     
     except Exception as e:
         error_message = f"Error in chat: {str(e)}"
-        print(error_message)
+        logger.exception("Error in chat: %s", e)
         yield error_message
         return
-        thread_id = await get_or_create_thread(user.sub)
-        
-        # Always get and provide social accounts info for better context awareness
-        social_accounts = await get_connected_accounts(user.sub)
-        
-        # Add context information if accounts are connected
-        if social_accounts:
-            account_context = """IMPORTANT USER CONTEXT - I HAVE THESE ACCOUNTS:
-"""
-            
-            for idx, account in enumerate(social_accounts):
-                platform = account.get("platform", "unknown")
-                username = account.get("username", "unknown")
-                platform_data = account.get("platformData", {})
-                
-                account_context += f"\n{idx+1}. {platform.upper()} ACCOUNT: @{username}\n"
-                
-                # Add key metrics
-                followers = platform_data.get("followers", "unknown")
-                following = platform_data.get("following", "unknown")
-                posts = platform_data.get("posts", "unknown")
-                engagement = platform_data.get("engagement", "unknown")
-                
-                account_context += f"   - Followers: {followers}\n"
-                if following != "unknown":
-                    account_context += f"   - Following: {following}\n"
-                account_context += f"   - Posts: {posts}\n"
-                account_context += f"   - Engagement Rate: {engagement}%\n"
-                
-                # Add insights if available
-                insights = platform_data.get("insights", {})
-                if insights:
-                    account_context += "\n   ANALYTICS INSIGHTS:\n"
-                    
-                    # Engagement trend
-                    if "engagementTrend" in insights:
-                        trend = insights["engagementTrend"]
-                        account_context += f"   - Engagement trend: {trend['direction'].upper()} {abs(trend['value']):.1f}% over {trend['period']}\n"
-                    
-                    # Follower growth
-                    if "followerGrowth" in insights:
-                        growth = insights["followerGrowth"]
-                        account_context += f"   - Follower growth: {growth['direction'].upper()} {abs(growth['value']):.1f}% over {growth['period']}\n"
-                    
-                    # Best content type
-                    if "bestContentType" in insights:
-                        best_type = insights["bestContentType"]
-                        account_context += f"   - Best performing content type: {best_type['type'].upper()} with avg engagement of {best_type['avgEngagement']:.1f}\n"
-                
-                # Add recent performance summary if available
-                if "dailyStats" in platform_data and platform_data["dailyStats"]:
-                    account_context += "\n   RECENT PERFORMANCE:\n"
-                    recent_stats = platform_data["dailyStats"][-3:] # Just show last 3 days to avoid too much text
-                    for day in recent_stats:
-                        date = day.get("date", "")
-                        day_followers = day.get("followers", 0)
-                        day_engagement = day.get("engagement", 0)
-                        account_context += f"   - {date}: {day_followers} followers, {day_engagement}% engagement\n"
-                
-                # Add top content if available
-                if "contentPerformance" in platform_data and platform_data["contentPerformance"]:
-                    top_content = platform_data["contentPerformance"][:2]  # Just show top 2 to avoid too much text
-                    if top_content:
-                        account_context += "\n   TOP PERFORMING CONTENT:\n"
-                        for content in top_content:
-                            title = content.get("title", "Untitled")
-                            content_type = content.get("type", "post")
-                            likes = content.get("likes", 0)
-                            comments = content.get("comments", 0)
-                            shares = content.get("shares", 0)
-                            date = content.get("date", "")
-                            account_context += f"   - {title} ({content_type}) on {date}: {likes} likes, {comments} comments, {shares} shares\n"
-            
-            account_context += "\nWhen I ask about 'my account' or 'my username' or any details about my accounts, ALWAYS reference this specific information directly. Analyze this data to provide personalized advice."
-            
-            # Add account information as a system message at the beginning
-            client.beta.threads.messages.create(
-                thread_id=thread_id,
-                role="user",
-                content=f"USER'S CONNECTED ACCOUNT INFO (PLEASE DIRECTLY REFERENCE THIS DATA WHEN ASKED ABOUT ACCOUNTS):\n{account_context}"
-            )
-        
-        # Add the user's message to the thread
-        if request.image_data:
-            # If there's an image, create a message with both text and image
-            # Process the image data to ensure proper formatting
-            image_data = request.image_data.strip()
-            
-            # Ensure the data doesn't already have the data:image prefix
-            if image_data.startswith('data:'):
-                image_url = image_data  # Already properly formatted
-            else:
-                image_url = f"data:image/jpeg;base64,{image_data}"
-                
-            client.beta.threads.messages.create(
-                thread_id=thread_id,
-                role="user",
-                content=[
-                    {"type": "text", "text": request.messages[-1].content},
-                    {"type": "image_url", "image_url": {"url": image_url}}
-                ]
-            )
-        else:
-            # Just text message
-            client.beta.threads.messages.create(
-                thread_id=thread_id,
-                role="user",
-                content=request.messages[-1].content  # Just add the most recent message
-            )
-        
-        # Run the assistant on the thread with standard (non-streaming) method
-        run = client.beta.threads.runs.create(
-            thread_id=thread_id,
-            assistant_id=ASSISTANT_ID
-        )
-        
-        # Create the illusion of streaming by yielding small chunks with delays
-        # This is a fallback since the OpenAI Assistant API streaming doesn't match our async for loop approach
-        
-        # Wait for run to complete while yielding status indicators
-        max_wait = 60  # Maximum wait time in seconds
-        start_time = time.time()
-        run_completed = False
-        
-        # Removed thinking message and instead use text that prompts the user about image generation
-        
-        # Poll for completion while yielding progress indicators
-        while True:
-            run_status = client.beta.threads.runs.retrieve(
-                thread_id=thread_id,
-                run_id=run.id
-            )
-            
-            if run_status.status == "completed":
-                run_completed = True
-                break
-            elif run_status.status in ["failed", "cancelled", "expired"]:
-                yield f"\nError: Assistant run failed with status: {run_status.status}"
-                return
-            
-            # Check if we've exceeded max wait time
-            if time.time() - start_time > max_wait:
-                yield "\nError: Response timed out"
-                return
-                
-            time.sleep(1)  # Wait briefly between polls
-        
-        if run_completed:
-            # Get the message and stream it in small chunks
-            messages = client.beta.threads.messages.list(
-                thread_id=thread_id,
-                order="desc",
-                limit=1
-            )
-            
-            # Extract the assistant's reply
-            assistant_message = messages.data[0]
-            if assistant_message.role != "assistant":
-                yield "\nError: Expected assistant reply but got something else"
-                return
-                
-            # Get full message content
-            full_content = ""
-            for content_part in assistant_message.content:
-                if content_part.type == "text":
-                    full_content += content_part.text.value
-            
-            # Clear the "Thinking..." text
-            yield "\r" + " " * 10 + "\r"  # Clear the line
-            
-            # Stream the content in small chunks to simulate typing
-            chunk_size = 2  # Smaller chunks for more realistic typing effect
-            for i in range(0, len(full_content), chunk_size):
-                yield full_content[i:i+chunk_size]
-                # Variable timing between chunks for natural typing effect
-                time.sleep(0.02 + (0.01 * (i % 3)))  # Slight random variation
-            
-            # Save the message to history
-            all_messages = request.messages.copy()
-            all_messages.append(Message(role="assistant", content=full_content))
-            await save_chat_history(user.sub, all_messages)
-            
-            # Increment chat count
-            await increment_chat_count(user.sub)
-        
     except Exception as e:
-        print(f"Error in streaming response: {e}")
+        logger.exception("Error in streaming response: %s", e)
         yield f"Error: {str(e)}"
\ No newline at end of file
@@ -5,10 +5,13 @@ from app.auth import AuthorizedUser
 
 router = APIRouter(prefix="/api/chat")
 
+# Regex compiled once at import instead of per call
+_SANITIZE_RE = re.compile(r'[^a-zA-Z0-9._-]')
+
 # Helper function to sanitize storage key
 def sanitize_storage_key(key: str) -> str:
     """Sanitize storage key to only allow alphanumeric and ._- symbols"""
-    return re.sub(r'[^a-zA-Z0-9._-]', '', key)
+    return _SANITIZE_RE.sub('', key)
 
 @router.delete("/history")
 async def clear_chat_history(user: AuthorizedUser):
@@ -17,9 +20,16 @@ async def clear_chat_history(user: AuthorizedUser):
         # Get storage key for user's chat history
         storage_key = sanitize_storage_key(f"chat_history_{user.sub}")
         
-        # Clear history by saving an empty list
+        # Clear history by saving an empty list in both layouts: the chat
+        # module reads the orjson/binary copy first, with json as fallback
+        db.storage.binary.put(storage_key, b"[]")
         db.storage.json.put(storage_key, [])
-        
+
+        # The chat module keeps the history resident in memory between
+        # turns; drop it so the next save doesn't resurrect old entries
+        from app.apis.chat import discard_history_cache
+        discard_history_cache(user.sub)
+
         return {"success": True, "message": "Chat history cleared successfully"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error clearing chat history: {str(e)}")
@@ -1,65 +1,20 @@
-import json
-import databutton as db
+import logging
+
 from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel
 from typing import Dict, Optional
 from app.auth import AuthorizedUser
 
-# Initialize Firebase Admin SDK
+# Firebase Admin initialization is shared and lazy; the first endpoint that
+# needs a client triggers it via the bootstrap accessors
+from app.apis._firebase_boot import HAS_FIREBASE_ADMIN, get_async_firestore_client
+
 try:
-    import firebase_admin
-    from firebase_admin import credentials, firestore
-    
-    # For debugging purposes
-    firebase_admin_initialized = False
-    firestore_db = None
-    
-    # Check if Firebase Admin is initialized
-    try:
-        app = firebase_admin.get_app()
-        print("Firebase Admin SDK already initialized")
-        firebase_admin_initialized = True
-    except ValueError:
-        # Get Firebase service account from secrets
-        try:
-            firebase_sa = db.secrets.get("FIREBASE_SERVICE_ACCOUNT")
-            if firebase_sa and firebase_sa.strip():
-                try:
-                    # If it's a JSON string, parse it
-                    if firebase_sa.strip().startswith('{'): 
-                        cred_dict = json.loads(firebase_sa)
-                        cred = credentials.Certificate(cred_dict)
-                    else:
-                        # If it's a base64 string or other format, handle accordingly
-                        print("Firebase service account is not in JSON format")
-                        raise ValueError("Firebase service account is not in JSON format")
-                        
-                    # Initialize the app with the credentials
-                    firebase_admin.initialize_app(cred)
-                    firebase_admin_initialized = True
-                    print("Firebase Admin SDK initialized successfully")
-                except json.JSONDecodeError as e:
-                    print(f"Error parsing Firebase service account JSON: {e}")
-                    print(f"First 10 chars of service account: {firebase_sa[:10]}...")
-                except Exception as e:
-                    print(f"Error initializing Firebase Admin SDK: {e}")
-            else:
-                print("Firebase service account not found or empty in secrets")
-        except Exception as e:
-            print(f"Error accessing Firebase service account secret: {e}")
-    
-    # Only get Firestore client if Firebase Admin SDK is initialized
-    if firebase_admin_initialized:
-        try:
-            firestore_db = firestore.client()
-            print("Firestore client initialized successfully")
-        except Exception as e:
-            print(f"Error getting Firestore client: {e}")
-            firestore_db = None
+    from firebase_admin import firestore
 except ImportError:
-    print("Firebase Admin SDK not available")
-    firebase_admin = None
-    firestore_db = None
+    firestore = None
+
+logger = logging.getLogger(__name__)
 
 # Initialize router
 router = APIRouter(prefix="/api")
@@ -84,7 +39,7 @@ class UserProfileResponse(BaseModel):
 # Endpoint to create a user profile
 @router.post("/create-user-profile")
 async def create_user_profile2(user: AuthorizedUser) -> UserProfileResponse:
-    if not firebase_admin:
+    if not HAS_FIREBASE_ADMIN:
         return UserProfileResponse(
             success=False,
             message="Firebase Admin SDK not available"
@@ -103,17 +58,17 @@ async def create_user_profile2(user: AuthorizedUser) -> UserProfileResponse:
         }
         
         # Check if user already exists
-        doc_ref = firestore_db.collection("users").document(user.sub)
-        doc = doc_ref.get()
-        
+        doc_ref = get_async_firestore_client().collection("users").document(user.sub)
+        doc = await doc_ref.get()
+
         if doc.exists:
             return UserProfileResponse(
                 success=True,
                 message="User profile already exists"
             )
-        
+
         # Create new user document
-        doc_ref.set(user_data)
+        await doc_ref.set(user_data)
         
         # Return success response
         return UserProfileResponse(
@@ -122,7 +77,7 @@ async def create_user_profile2(user: AuthorizedUser) -> UserProfileResponse:
         )
     
     except Exception as e:
-        print(f"Error creating user profile: {e}")
+        logger.exception("Error creating user profile: %s", e)
         return UserProfileResponse(
             success=False,
             message=f"Error creating user profile: {str(e)}"
@@ -131,7 +86,7 @@ async def create_user_profile2(user: AuthorizedUser) -> UserProfileResponse:
 # Endpoint to get a user profile
 @router.get("/get-user-profile")
 async def get_user_profile2(user: AuthorizedUser) -> UserProfileResponse:
-    if not firebase_admin:
+    if not HAS_FIREBASE_ADMIN:
         return UserProfileResponse(
             success=False,
             message="Firebase Admin SDK not available"
@@ -139,14 +94,14 @@ async def get_user_profile2(user: AuthorizedUser) -> UserProfileResponse:
     
     try:
         # Get user document from Firestore
-        doc_ref = firestore_db.collection("users").document(user.sub)
-        doc = doc_ref.get()
-        
+        doc_ref = get_async_firestore_client().collection("users").document(user.sub)
+        doc = await doc_ref.get()
+
         if not doc.exists:
             # Create user profile if it doesn't exist
             await create_user_profile2(user)
             # Get the newly created profile
-            doc = doc_ref.get()
+            doc = await doc_ref.get()
         
         user_data = doc.to_dict()
         
@@ -154,14 +109,15 @@ async def get_user_profile2(user: AuthorizedUser) -> UserProfileResponse:
         if "createdAt" in user_data and hasattr(user_data["createdAt"], "timestamp"):
             user_data["createdAt"] = user_data["createdAt"].strftime("%Y-%m-%dT%H:%M:%S.%fZ")
             
-        # Return user profile
+        # Data straight from our own Firestore documents is trusted, so skip
+        # the per-field validators on this hot read path
         return UserProfileResponse(
             success=True,
-            profile=UserProfile(**user_data)
+            profile=UserProfile.model_construct(**user_data)
         )
     
     except Exception as e:
-        print(f"Error getting user profile: {e}")
+        logger.exception("Error getting user profile: %s", e)
         return UserProfileResponse(
             success=False,
             message=f"Error getting user profile: {str(e)}"
@@ -170,7 +126,7 @@ async def get_user_profile2(user: AuthorizedUser) -> UserProfileResponse:
 # Endpoint to update a user profile
 @router.post("/update-user-profile")
 async def update_user_profile2(profile: UserProfile, user: AuthorizedUser) -> UserProfileResponse:
-    if not firebase_admin:
+    if not HAS_FIREBASE_ADMIN:
         return UserProfileResponse(
             success=False,
             message="Firebase Admin SDK not available"
@@ -182,19 +138,28 @@ async def update_user_profile2(profile: UserProfile, user: AuthorizedUser) -> Us
     
     try:
         # Get user document reference
-        doc_ref = firestore_db.collection("users").document(user.sub)
-        
-        # Update the profile
-        update_data = profile.dict(exclude={"uid", "createdAt"})
-        doc_ref.update(update_data)
-        
+        doc_ref = get_async_firestore_client().collection("users").document(user.sub)
+
+        # Only write the fields the caller actually sent: smaller Firestore
+        # payload and index cost, and fields they didn't touch stay intact
+        update_data = profile.model_dump(
+            exclude={"uid", "createdAt"}, exclude_unset=True, exclude_none=True
+        )
+        if update_data:
+            await doc_ref.update(update_data)
+
+            # The chat module caches usage/accounts per user with a short
+            # TTL; drop its entries so limit changes apply immediately
+            from app.apis.chat import invalidate_user_caches
+            invalidate_user_caches(user.sub)
+
         return UserProfileResponse(
             success=True,
             message="Profile updated successfully"
         )
     
     except Exception as e:
-        print(f"Error updating user profile: {e}")
+        logger.exception("Error updating user profile: %s", e)
         return UserProfileResponse(
             success=False,
             message=f"Error updating user profile: {str(e)}"
@@ -203,19 +168,18 @@ async def update_user_profile2(profile: UserProfile, user: AuthorizedUser) -> Us
 # Endpoint to list all users (admin only)
 @router.get("/list-users")
 async def list_users2(user: AuthorizedUser) -> Dict:
-    if not firebase_admin:
+    if not HAS_FIREBASE_ADMIN:
         return {"success": False, "message": "Firebase Admin SDK not available"}
     
     # TODO: Add admin authorization check
     
     try:
         # Get all users from Firestore
-        users_ref = firestore_db.collection("users")
-        users = users_ref.stream()
-        
+        users_ref = get_async_firestore_client().collection("users")
+
         # Convert to list of dicts
         user_list = []
-        for user_doc in users:
+        async for user_doc in users_ref.stream():
             user_data = user_doc.to_dict()
             
             # Convert Firestore timestamp to string
@@ -227,5 +191,5 @@ async def list_users2(user: AuthorizedUser) -> Dict:
         return {"success": True, "users": user_list}
     
     except Exception as e:
-        print(f"Error listing users: {e}")
+        logger.exception("Error listing users: %s", e)
         return {"success": False, "message": f"Error listing users: {str(e)}"}
\ No newline at end of file
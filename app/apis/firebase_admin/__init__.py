@@ -1,18 +1,24 @@
-import json
-import databutton as db
-import os
+import logging
+
 from fastapi import APIRouter, HTTPException, status
 from pydantic import BaseModel
 from typing import Optional, Dict, Any, List
 
-# Import Firebase Admin modules
+# Shared lazy Firebase Admin bootstrap; initialization and client setup
+# live in one place instead of per-module import-time blocks
+from app.apis._firebase_boot import (
+    HAS_FIREBASE_ADMIN,
+    get_firebase_app,
+    get_firestore_client,
+    get_async_firestore_client,
+)
+
 try:
-    import firebase_admin
-    from firebase_admin import credentials, auth, firestore
-    HAS_FIREBASE_ADMIN = True
+    from firebase_admin import auth
 except ImportError:
-    print("Firebase Admin SDK not available, please install it with pip")
-    HAS_FIREBASE_ADMIN = False
+    auth = None
+
+logger = logging.getLogger(__name__)
 
 # Initialize router (required for all API modules)
 router = APIRouter()
@@ -34,57 +40,18 @@ class UserProfileRequest(BaseModel):
     displayName: Optional[str] = None
     photoURL: Optional[str] = None
 
-# Initialize Firebase Admin
-firebase_admin_initialized = False
-firebase_app = None
-firestore_db = None
-
-try:
-    import firebase_admin
-    
-    # Check if Firebase Admin SDK is already initialized
-    try:
-        firebase_app = firebase_admin.get_app()
-        print("Firebase Admin SDK already initialized in firebase_admin API")
-        firebase_admin_initialized = True
-    except ValueError:
-        # Not initialized, try to initialize
-        try:
-            # Try to get Firebase credentials from secrets
-            firebase_credentials_json = db.secrets.get("FIREBASE_SERVICE_ACCOUNT")
-            if firebase_credentials_json:
-                # Parse JSON string into dictionary
-                cred_dict = json.loads(firebase_credentials_json)
-                # Create temporary credentials file
-                cred = credentials.Certificate(cred_dict)
-                # Initialize the app
-                firebase_app = firebase_admin.initialize_app(cred)
-                firebase_admin_initialized = True
-                print("Firebase Admin SDK initialized successfully in firebase_admin API")
-            else:
-                print("Firebase service account not found in secrets")
-        except Exception as e:
-            print(f"Error initializing Firebase Admin SDK in firebase_admin API: {e}")
-    
-    # Only get Firestore client if Firebase Admin SDK is initialized
-    if firebase_admin_initialized:
-        try:
-            firestore_db = firestore.client()
-            print("Firestore client initialized successfully in firebase_admin API")
-        except Exception as e:
-            print(f"Error getting Firestore client in firebase_admin API: {e}")
-            firestore_db = None
-except ImportError:
-    print("Firebase Admin SDK not available in firebase_admin API")
-
-# Helper functions for Firebase operations
+# Helper functions for Firebase operations; clients are created lazily on
+# first use by the shared bootstrap
 def get_auth():
-    if firebase_admin_initialized:
+    if HAS_FIREBASE_ADMIN and get_firebase_app() is not None:
         return auth
     return None
 
 def get_firestore():
-    return firestore_db
+    return get_firestore_client()
+
+def get_async_firestore():
+    return get_async_firestore_client()
 
 # API endpoints for user profiles using Firebase Admin SDK
 @router.post("/create-user-profile")
@@ -106,12 +73,13 @@ async def create_user_profile(user_data: UserProfileRequest) -> Dict[str, Any]:
         )
         
         # Save profile to Firestore
-        db = get_firestore()
-        db.collection('users').document(user_data.uid).set(profile.dict())
+        db = get_async_firestore()
+        profile_data = profile.model_dump()
+        await db.collection('users').document(user_data.uid).set(profile_data)
         
-        return {"success": True, "profile": profile.dict()}
+        return {"success": True, "profile": profile_data}
     except Exception as e:
-        print(f"Error creating user profile: {str(e)}")
+        logger.exception("Error creating user profile: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to create user profile: {str(e)}"
@@ -123,21 +91,21 @@ async def get_user_profile(uid: str) -> Dict[str, Any]:
     Get a user profile by UID from Firestore
     """
     try:
-        db = get_firestore()
+        db = get_async_firestore()
         doc_ref = db.collection('users').document(uid)
-        doc = doc_ref.get()
-        
+        doc = await doc_ref.get()
+
         if not doc.exists:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"User profile not found for UID: {uid}"
             )
-        
+
         return {"success": True, "profile": doc.to_dict()}
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Error getting user profile: {str(e)}")
+        logger.exception("Error getting user profile: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to get user profile: {str(e)}"
@@ -149,60 +117,67 @@ async def update_user_profile(uid: str, update_data: Dict[str, Any]) -> Dict[str
     Update a user profile by UID in Firestore
     """
     try:
-        db = get_firestore()
+        db = get_async_firestore()
         doc_ref = db.collection('users').document(uid)
-        doc = doc_ref.get()
-        
+        doc = await doc_ref.get()
+
         if not doc.exists:
             raise HTTPException(
                 status_code=status.HTTP_404_NOT_FOUND,
                 detail=f"User profile not found for UID: {uid}"
             )
-        
+
         # Update document with merge=True to only update specified fields
-        doc_ref.update(update_data)
-        
+        await doc_ref.update(update_data)
+
+        # Drop the chat module's short-TTL caches for this user so the next
+        # read reflects this write
+        from app.apis.chat import invalidate_user_caches
+        invalidate_user_caches(uid)
+
         # Get the updated document
-        updated_doc = doc_ref.get()
+        updated_doc = await doc_ref.get()
         
         return {"success": True, "profile": updated_doc.to_dict()}
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Error updating user profile: {str(e)}")
+        logger.exception("Error updating user profile: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to update user profile: {str(e)}"
         )
 
 @router.get("/list-users")
-async def list_users(limit: int = 100, offset: int = 0) -> Dict[str, Any]:
+async def list_users(limit: int = 100, page_token: Optional[str] = None) -> Dict[str, Any]:
     """
-    List all user profiles with pagination from Firestore
-    Admin only endpoint
+    List user profiles with cursor pagination from Firestore
+    Admin only endpoint; pass the returned next_page_token to fetch the next page
     """
     try:
-        db = get_firestore()
-        # Note: Firestore doesn't directly support offset pagination
-        # For a production app, you'd want to use cursor-based pagination
-        users_ref = db.collection('users').limit(limit)
-        docs = users_ref.stream()
-        
-        user_profiles = [doc.to_dict() for doc in docs]
-        
-        # Simple client-side pagination
-        total_count = len(user_profiles)
-        paginated_profiles = user_profiles[offset:offset+limit] if offset < total_count else []
-        
+        db = get_async_firestore()
+        # Cursor pagination: order by uid and resume after the last profile of
+        # the previous page, so each page costs one page of reads instead of
+        # re-downloading everything before the offset
+        users_ref = db.collection('users').order_by('uid')
+        if page_token:
+            users_ref = users_ref.start_after({'uid': page_token})
+        users_ref = users_ref.limit(limit)
+
+        user_profiles = [doc.to_dict() async for doc in users_ref.stream()]
+
+        # A short page means there is nothing after it
+        next_page_token = user_profiles[-1].get('uid') if len(user_profiles) == limit else None
+
         return {
-            "success": True, 
-            "users": paginated_profiles,
-            "total": total_count,
+            "success": True,
+            "users": user_profiles,
+            "count": len(user_profiles),
             "limit": limit,
-            "offset": offset
+            "next_page_token": next_page_token
         }
     except Exception as e:
-        print(f"Error listing users: {str(e)}")
+        logger.exception("Error listing users: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Failed to list users: {str(e)}"
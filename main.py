@@ -2,6 +2,8 @@ import os
 import dotenv
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
 import httpx
 import logging
 
@@ -14,8 +16,11 @@ dotenv.load_dotenv()
 DATABUTTON_TOKEN = os.getenv("DATABUTTON_TOKEN")
 
 def create_app() -> FastAPI:
-    app = FastAPI()
+    # orjson response encoding by default, and gzip for anything over 1KB
+    # (markdown chat replies and history payloads compress well)
+    app = FastAPI(default_response_class=ORJSONResponse)
 
+    app.add_middleware(GZipMiddleware, minimum_size=1024)
     app.add_middleware(
         CORSMiddleware,
         allow_origins=["https://prsocials21.onrender.com", "http://localhost:5173"],